@@ -0,0 +1,133 @@
+"""Кэш в SQLite против LocMemCache и FileBasedCache.
+
+    python -m benchmarks.cache --workers 4
+
+Сначала в одном процессе замеряется время отдельных операций. Затем
+несколько процессов, как воркеры сервера, запрашивают страницы с
+популярностью по степенному закону и кэшируют промахи. LocMemCache у
+каждого процесса свой, поэтому его доля попаданий падает с числом
+воркеров, а общий кэш прогревается один раз на всех.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.utils import setup_django
+
+PAGE = 'x' * 20_000
+PAGES = 500
+BACKENDS = ('locmem', 'filebased', 'sqlite')
+
+
+def make_cache(backend, directory):
+    from django.core.cache.backends.filebased import FileBasedCache
+    from django.core.cache.backends.locmem import LocMemCache
+
+    from core.cache import SQLiteCache
+
+    params = {'OPTIONS': {'MAX_ENTRIES': 100_000}}
+    if backend == 'locmem':
+        return LocMemCache(f'benchmark-{os.getpid()}', params)
+    if backend == 'filebased':
+        return FileBasedCache(os.path.join(directory, 'files'), params)
+    return SQLiteCache(os.path.join(directory, 'cache.sqlite3'), params)
+
+
+def per_call(func, repeat):
+    start = time.perf_counter()
+    for index in range(repeat):
+        func(index)
+    return (time.perf_counter() - start) / repeat * 10 ** 6
+
+
+def operations(backend, directory, repeat):
+    """Микросекунды на операцию для одного процесса."""
+    cache = make_cache(backend, directory)
+    for index in range(PAGES):
+        cache.set(f'page:{index}', PAGE)
+    cache.set('counter', 0)
+    keys = [f'page:{index}' for index in range(10)]
+    return {
+        'get hit': per_call(
+            lambda index: cache.get(f'page:{index % PAGES}'), repeat),
+        'get miss': per_call(
+            lambda index: cache.get(f'missing:{index}'), repeat),
+        'set': per_call(
+            lambda index: cache.set(f'page:{index % PAGES}', PAGE), repeat),
+        'get_many(10)': per_call(lambda index: cache.get_many(keys), repeat),
+        'incr': per_call(lambda index: cache.incr('counter'), repeat),
+    }
+
+
+def worker(backend, directory, requests, seed, results):
+    cache = make_cache(backend, directory)
+    rng = random.Random(seed)
+    weights = list(itertools.accumulate(
+        1 / rank for rank in range(1, PAGES + 1)))
+    hits = 0
+    start = time.perf_counter()
+    for index in rng.choices(range(PAGES), cum_weights=weights, k=requests):
+        key = f'page:{index}'
+        if cache.get(key) is None:
+            cache.set(key, PAGE)
+        else:
+            hits += 1
+    results.put((hits, time.perf_counter() - start))
+
+
+def shared(backend, directory, workers, requests):
+    """Доля попаданий и суммарная пропускная способность воркеров."""
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=worker,
+            args=(backend, directory, requests, seed, results))
+        for seed in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    hits = sum(hits for hits, _ in outcomes)
+    elapsed = statistics.mean(seconds for _, seconds in outcomes)
+    return hits / (workers * requests), workers * requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5000)
+    args = parser.parse_args()
+    setup_django()
+
+    for backend in BACKENDS:
+        directory = tempfile.mkdtemp()
+        try:
+            timings = operations(backend, directory, args.repeat)
+        finally:
+            shutil.rmtree(directory)
+        print(f'{backend:<10} ' + '  '.join(
+            f'{name} {value:7.1f} us' for name, value in timings.items()))
+    for backend in BACKENDS:
+        directory = tempfile.mkdtemp()
+        try:
+            hit_rate, throughput = shared(
+                backend, directory, args.workers, args.requests)
+        finally:
+            shutil.rmtree(directory)
+        print(
+            f'{backend:<10} {args.workers} workers  '
+            f'hit rate {hit_rate:6.1%}  {throughput:9.0f} requests/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Пиковая память на одну загрузку картинки поста.
+
+    python -m benchmarks.image_upload
+
+Каждая загрузка выполняется в отдельном свежем процессе: перед ней
+счётчик пикового RSS сбрасывается через /proc/self/clear_refs, после
+неё читается VmHWM. Поэтому бенчмарк работает только на Linux.
+
+Для сравнения рядом выводится полное декодирование той же картинки:
+столько памяти занимал бы исходник, развёрнутый целиком.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+from benchmarks.utils import setup_django
+
+CASES = (
+    ('JPEG', (8000, 6000)),
+    ('JPEG', (4000, 3000)),
+    ('PNG', (3000, 2000)),
+)
+
+
+def read_status(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field):
+                return int(line.split()[1]) * 1024
+
+
+def peak_rss(func, *args):
+    """Прирост пикового RSS процесса за время func(*args), в байтах."""
+    baseline = read_status('VmRSS')
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+    result = func(*args)
+    return read_status('VmHWM') - baseline, result
+
+
+def prepare():
+    setup_django()
+    from PIL import Image
+
+    import posts.forms  # noqa: F401
+    Image.init()
+
+
+def full_decode(path):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.load()
+    return True
+
+
+def ingest_upload(path):
+    """Загрузка так, как её видит view: временный файл и PostForm."""
+    from django.core.files import File
+    from django.core.files.uploadedfile import TemporaryUploadedFile
+
+    from posts.forms import PostForm
+
+    upload = TemporaryUploadedFile(
+        os.path.basename(path), None, os.path.getsize(path), None)
+    with open(path, 'rb') as file:
+        for chunk in File(file).chunks():
+            upload.write(chunk)
+    upload.seek(0)
+    form = PostForm({'text': 'Пост'}, {'image': upload})
+    return form.is_valid()
+
+
+def run_isolated(func, path):
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1, initializer=prepare) as pool:
+        return pool.apply(peak_rss, (func, path))
+
+
+def make_image(directory, image_format, size):
+    from PIL import Image
+
+    path = os.path.join(
+        directory, f'{size[0]}x{size[1]}.{image_format.lower()}')
+    noise = Image.effect_noise((size[0] // 16, size[1] // 16), 64)
+    noise.resize(size).convert('RGB').save(path, image_format)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.parse_args()
+    directory = tempfile.mkdtemp()
+    for image_format, size in CASES:
+        path = make_image(directory, image_format, size)
+        name = f'{image_format} {size[0]}x{size[1]}'
+        for label, func in (('full decode', full_decode),
+                            ('PostForm', ingest_upload)):
+            memory, accepted = run_isolated(func, path)
+            print(
+                f'{name:<16} {label:<12} '
+                f'peak RSS {memory / 2 ** 20:8.1f} MB  '
+                f'{"accepted" if accepted else "rejected"}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Попадание в кэш страниц: готовый gzip против пересжатия на лету.
+
+    python -m benchmarks.page_cache
+
+Главная страница один раз попадает в кэш, после чего замеряется
+выдача из кэша: несжатой, сжатой из хранимых кусков и несжатой с
+последующим gzip, как это делал бы GZipMiddleware. Рядом выводится
+размер записи в кэше и размер несжатой страницы.
+"""
+import argparse
+import gzip
+import pickle
+
+from benchmarks.utils import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=300)
+    args = parser.parse_args()
+    setup_django()
+
+    from django.core.cache import cache
+    from django.test import Client
+    from django.urls import reverse
+
+    from posts.caching import PAGE_KEY
+    from posts.synthetic import SyntheticData
+
+    SyntheticData(users=200, groups=10, posts=args.posts).generate()
+    client = Client()
+    url = reverse('posts:index')
+    cache.clear()
+    identity = client.get(url).content
+
+    def recompress():
+        gzip.compress(client.get(url).content, compresslevel=6)
+
+    report('identity', measure(lambda: client.get(url), args.repeat))
+    report('stored gzip', measure(
+        lambda: client.get(url, HTTP_ACCEPT_ENCODING='gzip'), args.repeat))
+    report('identity + gzip on the fly', measure(recompress, args.repeat))
+
+    key = next(
+        key for key in cache_keys(cache)
+        if key.startswith(PAGE_KEY.format('index_page', '')))
+    entry = pickle.dumps(cache.get(key), pickle.HIGHEST_PROTOCOL)
+    print(f'page {len(identity) / 1024:.1f} KB, '
+          f'cache entry {len(entry) / 1024:.1f} KB')
+
+
+def cache_keys(cache):
+    rows = cache.connection.execute('SELECT key FROM cache')
+    return [key.split(':', 2)[2] for key, in rows]
+
+
+if __name__ == '__main__':
+    main()
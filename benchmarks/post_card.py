@@ -0,0 +1,69 @@
+"""Время отрисовки страницы ленты с кэшем карточек постов и без него.
+
+    python -m benchmarks.post_card
+"""
+from io import BytesIO
+
+from benchmarks.utils import measure, report, setup_django
+
+PAGE_SIZE = 10
+
+
+def make_image(name):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new('RGB', (1600, 1200), 'skyblue').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+def main():
+    setup_django()
+
+    from django.core.cache import cache
+    from django.template.loader import render_to_string
+    from django.test import RequestFactory, override_settings
+
+    from posts.models import Group, Post, User
+    from posts.thumbnails import process_pending
+    from posts.utils import paginate
+
+    author = User.objects.create_user(
+        username='author', first_name='Лев', last_name='Толстой')
+    group = Group.objects.create(title='Группа', slug='group')
+    for i in range(PAGE_SIZE):
+        Post.objects.create(
+            author=author,
+            group=group,
+            text=f'Пост {i}\n\nВторой абзац текста.',
+            image=make_image(f'image{i}.jpg'),
+        )
+    process_pending(workers=0)
+    request = RequestFactory().get('/')
+    request.user = author
+
+    def render_page():
+        posts = Post.objects.select_related('author', 'group')
+        page_obj = paginate(posts, None, PAGE_SIZE)
+        render_to_string('posts/index.html', {'page_obj': page_obj}, request)
+
+    cache.clear()
+    render_page()
+    no_fragments = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'template_fragments': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    }
+    with override_settings(CACHES=no_fragments):
+        render_page()
+        report('index page, no card cache', measure(render_page))
+    render_page()
+    report('index page, warm card cache', measure(render_page))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Полнотекстовый поиск против icontains на большой таблице постов.
+
+    python -m benchmarks.search --posts 1000000
+
+Строится страница результатов: число найденных и первые 10 постов.
+"""
+import argparse
+import random
+import time
+
+from benchmarks.utils import measure, report, setup_django
+
+WORDS = (
+    'закат рассвет море горы город лес река поезд дорога книга кофе '
+    'музыка кино дождь снег солнце ветер облако улица парк мост окно '
+    'собака кошка друг работа отпуск праздник вечер утро ночь звезда'
+).split()
+# Редкие слова с распределением Ципфа, чтобы запрос находил немного постов.
+VOCABULARY = WORDS + [f'тема{i}' for i in range(5000)]
+WEIGHTS = [1 / rank for rank in range(1, len(VOCABULARY) + 1)]
+BATCH_SIZE = 10000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    setup_django()
+
+    from posts.models import Post, User
+    from posts.search import SearchResults, rebuild_index
+
+    author = User.objects.create_user(username='author')
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for offset in range(0, args.posts, BATCH_SIZE):
+        Post.objects.bulk_create(
+            Post(
+                author=author,
+                text=' '.join(rng.choices(VOCABULARY, WEIGHTS, k=30)),
+            )
+            for _ in range(min(BATCH_SIZE, args.posts - offset))
+        )
+    rebuild_index()
+    print(f'{args.posts} posts indexed in {time.perf_counter() - start:.1f} s')
+    query = 'тема300 море'
+
+    def icontains():
+        posts = Post.objects.filter(
+            text__icontains='тема300').filter(text__icontains='море')
+        posts.count()
+        list(posts.select_related('author', 'group')[:10])
+
+    def fts():
+        results = SearchResults(query)
+        results.count()
+        results[0:10]
+
+    report('icontains', measure(icontains, args.repeat))
+    report('fts5', measure(fts, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
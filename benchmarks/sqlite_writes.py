@@ -0,0 +1,175 @@
+"""Конкурентная запись в SQLite: прагмы по умолчанию против профиля.
+
+    python -m benchmarks.sqlite_writes --workers 8
+
+Несколько процессов, как воркеры сервера, одновременно вызывают view
+записи: публикуют посты, комментируют, подписываются и отписываются.
+View работают в транзакциях atomic, со всеми сигналами и обработкой
+событий после ответа. База лежит во временном файле: в памяти
+блокировки и fsync не видны. Без профиля
+каждое соединение открывается на запрос с настройками SQLite по
+умолчанию (журнал отката, synchronous=FULL, без ожидания блокировки
+сверх таймаута драйвера); с профилем действуют SQLITE_PRAGMAS и
+постоянное соединение. Выводятся пропускная способность, задержка
+запроса на запись и число ошибок «database is locked».
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import YATUBE_DIR, percentile
+
+USERS = 20
+
+
+def setup(directory):
+    os.environ['YATUBE_CACHE_PATH'] = os.path.join(directory, 'cache.sqlite3')
+    sys.path.insert(0, YATUBE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    from django.conf import settings
+
+    settings.MEDIA_ROOT = directory
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    django.setup()
+
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+
+
+def use_database(path, pragmas, persistent):
+    from django.conf import settings
+    from django.db import connections
+
+    connections.close_all()
+    connections.databases['default']['NAME'] = path
+    connections.databases['default']['CONN_MAX_AGE'] = (
+        None if persistent else 0)
+    settings.SQLITE_PRAGMAS = pragmas
+
+
+def build(path):
+    """База с пользователями и постами в журнале отката, как без профиля.
+
+    Возвращает имена пользователей и id постов для комментариев.
+    """
+    from django.core.management import call_command
+
+    from posts.models import Post, User
+
+    use_database(path, {}, persistent=False)
+    call_command('migrate', verbosity=0)
+    User.objects.bulk_create(
+        User(username=f'writer{index}') for index in range(USERS))
+    for user in User.objects.all():
+        Post.objects.create(author=user, text=f'post by {user.username}')
+    return (
+        list(User.objects.values_list('username', flat=True)),
+        list(Post.objects.values_list('pk', flat=True)),
+    )
+
+
+def write_requests(usernames, posts, seed, index):
+    """Запросы на запись одного шага воркера: (метод, url, данные)."""
+    from django.urls import reverse
+
+    other = usernames[(seed + index + 1) % len(usernames)]
+    post_id = posts[(seed * 7 + index) % len(posts)]
+    return [
+        ('post', reverse('posts:post_create'), {'text': f'post {index}'}),
+        ('post', reverse('posts:add_comment', args=[post_id]),
+         {'text': f'comment {index}'}),
+        ('get', reverse('posts:profile_follow', args=[other]), None),
+        ('get', reverse('posts:profile_unfollow', args=[other]), None),
+    ]
+
+
+def worker(usernames, posts, requests, persistent, seed, results):
+    from django.db import OperationalError, connection
+    from django.test import Client
+
+    from posts.models import User
+
+    client = Client()
+    client.force_login(
+        User.objects.get(username=usernames[seed % len(usernames)]))
+    latencies = []
+    locked = 0
+    start = time.perf_counter()
+    for index in range(requests):
+        for method, url, data in write_requests(
+                usernames, posts, seed, index):
+            began = time.perf_counter()
+            try:
+                getattr(client, method)(url, data)
+            except OperationalError:
+                locked += 1
+            latencies.append(time.perf_counter() - began)
+            if not persistent:
+                connection.close()
+    results.put((locked, latencies, time.perf_counter() - start))
+
+
+def run(usernames, posts, workers, requests, persistent):
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=worker,
+            args=(usernames, posts, requests, persistent, seed, results))
+        for seed in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    locked = sum(count for count, _, _ in outcomes)
+    latencies = [value for _, samples, _ in outcomes for value in samples]
+    elapsed = max(seconds for _, _, seconds in outcomes)
+    return locked, latencies, len(latencies) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument(
+        '--requests', type=int, default=50,
+        help='Шагов на воркер; шаг — четыре запроса на запись')
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp()
+    try:
+        setup(directory)
+        from django.conf import settings
+
+        profiles = {
+            'defaults': ({}, False),
+            'production profile': (settings.SQLITE_PRAGMAS, True),
+        }
+        base = os.path.join(directory, 'base.sqlite3')
+        usernames, posts = build(base)
+        for index, (name, (pragmas, persistent)) in enumerate(
+                profiles.items()):
+            path = os.path.join(directory, f'profile{index}.sqlite3')
+            shutil.copy(base, path)
+            use_database(path, pragmas, persistent)
+            locked, latencies, throughput = run(
+                usernames, posts, args.workers, args.requests, persistent)
+            print(
+                f'{name:<20} {throughput:8.0f} requests/s  '
+                f'p50 {percentile(latencies, 50) * 1000:7.2f} ms  '
+                f'p95 {percentile(latencies, 95) * 1000:7.2f} ms  '
+                f'database is locked: {locked}'
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Общие инструменты бенчмарков.
+
+Бенчмарки запускаются из корня репозитория как модули:
+
+    python -m benchmarks.post_card
+
+База создаётся так же, как в тестах, поэтому рабочая db.sqlite3
+не затрагивается.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+YATUBE_DIR = os.path.join(BASE_DIR, 'yatube')
+
+
+def setup_django():
+    sys.path.insert(0, YATUBE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment
+
+    from core.testing import isolated_caches
+
+    setup_test_environment()
+    settings.MEDIA_ROOT = tempfile.mkdtemp()
+    override_settings(CACHES=isolated_caches()).enable()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def measure(func, repeat=50):
+    """Время выполнения func в секундах для каждого из repeat запусков."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples, percent):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(percent / 100 * len(ordered)))
+    return ordered[index]
+
+
+def report(name, samples):
+    print(
+        f'{name:<40} '
+        f'median {statistics.median(samples) * 1000:8.2f} ms  '
+        f'p95 {percentile(samples, 95) * 1000:8.2f} ms'
+    )
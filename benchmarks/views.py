@@ -0,0 +1,241 @@
+"""Задержка, запросы к базе и память основных view на наборах разного размера.
+
+    python -m benchmarks.views --sizes small,medium --save views.json
+    python -m benchmarks.views --compare views.json --threshold 0.2
+
+Для каждого размера база заново наполняется генератором generate_data,
+после чего каждый view вызывается через тестовый клиент со сброшенным
+кэшем страниц. Для view считаются перцентили времени ответа, число и
+суммарное время SQL-запросов, время отрисовки шаблона и пик памяти
+Python (tracemalloc, отдельным прогоном, чтобы не искажать время).
+
+С --compare результаты сверяются с сохранённым базовым файлом: если
+время или память выросли больше чем на threshold (и больше порога
+шума NOISE) или число запросов выросло хоть на один, бенчмарк
+завершается с кодом 1.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from benchmarks.utils import percentile, setup_django
+
+SIZES = {
+    'small': {'users': 200, 'groups': 10, 'posts': 2000},
+    'medium': {'users': 2000, 'groups': 50, 'posts': 20000},
+    'large': {'users': 10000, 'groups': 100, 'posts': 100000},
+}
+# Абсолютный рост, меньше которого метрика не считается ухудшившейся:
+# доли миллисекунды на быстрых view — это шум измерения.
+NOISE = {
+    'p50_ms': 0.5,
+    'p95_ms': 1.0,
+    'sql_ms': 0.5,
+    'render_ms': 0.5,
+    'peak_kb': 16,
+}
+
+
+@contextmanager
+def sql_timer():
+    """Считает SQL-запросы и их суммарное время."""
+    from django.db import connection
+
+    stats = {'queries': 0, 'time': 0.0}
+
+    def timed_execute(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats['queries'] += 1
+            stats['time'] += time.perf_counter() - start
+
+    with connection.execute_wrapper(timed_execute):
+        yield stats
+
+
+@contextmanager
+def render_timer():
+    """Суммирует время отрисовки шаблонов, вызванных из view."""
+    from django.template.backends.django import Template
+
+    render = Template.render
+    elapsed = [0.0]
+
+    def timed_render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            elapsed[0] += time.perf_counter() - start
+
+    Template.render = timed_render
+    try:
+        yield elapsed
+    finally:
+        Template.render = render
+
+
+def seed(size):
+    from django.core.management import call_command
+
+    from posts.synthetic import SyntheticData
+
+    call_command('flush', interactive=False, verbosity=0)
+    SyntheticData(**SIZES[size], follows_per_user=10).generate()
+
+
+def scenarios():
+    """(имя view, метод, url, данные) на заполненной базе."""
+    from django.db.models import Count
+    from django.urls import reverse
+
+    from posts.models import Group, Post, UserStats
+
+    author = UserStats.objects.order_by('-posts_count').first().user
+    group = Group.objects.annotate(
+        total=Count('posts')).order_by('-total').first()
+    post = Post.objects.order_by('-comments_count', 'id').first()
+    return [
+        ('index', 'get', reverse('posts:index'), None),
+        ('group_posts', 'get',
+         reverse('posts:group_list', args=[group.slug]), None),
+        ('profile', 'get',
+         reverse('posts:profile', args=[author.username]), None),
+        ('post_detail', 'get',
+         reverse('posts:post_detail', args=[post.id]), None),
+        ('follow_index', 'get', reverse('posts:follow_index'), None),
+        ('post_create', 'post', reverse('posts:post_create'),
+         {'text': 'Новый пост', 'group': group.id}),
+        ('add_comment', 'post',
+         reverse('posts:add_comment', args=[post.id]),
+         {'text': 'Новый комментарий'}),
+    ]
+
+
+def reader():
+    """Клиент пользователя с наибольшим числом подписок."""
+    from django.test import Client
+
+    from posts.models import UserStats
+
+    user = UserStats.objects.order_by('-following_count').first().user
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def request(client, method, url, data):
+    from django.core.cache import cache
+
+    cache.clear()
+    response = getattr(client, method)(url, data)
+    if response.status_code >= 400:
+        raise RuntimeError(f'{url}: {response.status_code}')
+
+
+def run_view(client, method, url, data, repeat):
+    request(client, method, url, data)
+    samples, queries, sql_times, render_times = [], [], [], []
+    for _ in range(repeat):
+        with sql_timer() as sql, render_timer() as rendered:
+            start = time.perf_counter()
+            request(client, method, url, data)
+            samples.append(time.perf_counter() - start)
+        queries.append(sql['queries'])
+        sql_times.append(sql['time'])
+        render_times.append(rendered[0])
+    tracemalloc.start()
+    request(client, method, url, data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'p50_ms': statistics.median(samples) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'queries': max(queries),
+        'sql_ms': statistics.median(sql_times) * 1000,
+        'render_ms': statistics.median(render_times) * 1000,
+        'peak_kb': peak / 1024,
+    }
+
+
+def print_row(size, view, result):
+    print(
+        f'{size:<7} {view:<13} '
+        f'p50 {result["p50_ms"]:7.2f} ms  p95 {result["p95_ms"]:7.2f} ms  '
+        f'p99 {result["p99_ms"]:7.2f} ms  '
+        f'queries {result["queries"]:3}  sql {result["sql_ms"]:6.2f} ms  '
+        f'render {result["render_ms"]:6.2f} ms  '
+        f'peak {result["peak_kb"]:8.1f} KB'
+    )
+
+
+def regressions(results, baseline, threshold):
+    """Описания метрик, ухудшившихся относительно baseline."""
+    found = []
+    for size, views in results.items():
+        for view, result in views.items():
+            expected = baseline.get(size, {}).get(view)
+            if expected is None:
+                continue
+            if result['queries'] > expected['queries']:
+                found.append(
+                    f'{size}/{view}: queries {expected["queries"]} '
+                    f'-> {result["queries"]}')
+            for metric, noise in NOISE.items():
+                growth = result[metric] - expected[metric]
+                if (growth > expected[metric] * threshold
+                        and growth > noise):
+                    found.append(
+                        f'{size}/{view}: {metric} '
+                        f'{expected[metric]:.2f} -> {result[metric]:.2f}')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--sizes', default='small,medium',
+        help=f'Размеры через запятую: {", ".join(SIZES)}',
+    )
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--save', help='Записать результаты в JSON')
+    parser.add_argument('--compare', help='Сравнить с базовым JSON')
+    parser.add_argument(
+        '--threshold', type=float, default=0.2,
+        help='Допустимый относительный рост времени и памяти',
+    )
+    args = parser.parse_args()
+    sizes = args.sizes.split(',')
+    setup_django()
+
+    results = {}
+    for size in sizes:
+        seed(size)
+        client = reader()
+        results[size] = {}
+        for view, method, url, data in scenarios():
+            result = run_view(client, method, url, data, args.repeat)
+            results[size][view] = result
+            print_row(size, view, result)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        found = regressions(results, baseline, args.threshold)
+        for line in found:
+            print(f'REGRESSION {line}')
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
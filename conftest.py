@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_cache(django_test_environment):
+    """Тесты очищают кэш: у них свой файл, см. core.testing."""
+    from django.test import override_settings
+
+    from core.testing import isolated_caches
+
+    with override_settings(CACHES=isolated_caches()):
+        yield
@@ -0,0 +1,15 @@
+"""SQLite, в котором транзакции сразу берут блокировку записи.
+
+Обычный BEGIN в SQLite отложенный: транзакция читает без блокировки,
+а при первой записи пытается её получить. Если за это время другое
+соединение уже записало, SQLite сразу отвечает «database is locked»,
+не дожидаясь busy_timeout. Транзакции Django (atomic) почти всегда
+что-то пишут, поэтому здесь они начинаются с BEGIN IMMEDIATE и ждут
+писателя в начале, как транзакции кэша в core.cache.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,334 @@
+"""Бэкенды кэша с метриками попаданий.
+
+SQLiteCache — кэш в файле SQLite в режиме WAL, общий для всех
+процессов на хосте: страница, закэшированная одним воркером, видна
+остальным, и сброс тегов доходит до всех. Читатели в WAL не ждут
+писателей; записи сериализует блокировка базы.
+
+Размер кэша ограничен числом записей (MAX_ENTRIES) и суммарным
+объёмом (OPTIONS['MAX_SIZE'], байты); при переполнении сначала
+удаляются просроченные записи, затем давно не читавшиеся (LRU).
+Время последнего чтения обновляется не чаще раза в ACCESS_RESOLUTION
+секунд, чтобы частые чтения не превращались в запись, и только если
+база свободна: чтение никогда не ждёт чужую запись.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .metrics import CACHE
+
+MISSING = object()
+# Префиксы ключей, по которым обращения к кэшу делятся на виды.
+KEY_KINDS = (
+    ('template.cache.', 'fragment'),
+    ('page:', 'page'),
+    ('cache_tag:', 'tag'),
+    ('follow_graph:', 'follow_graph'),
+)
+
+
+DEFAULT_MAX_SIZE = 256 * 2 ** 20
+ACCESS_RESOLUTION = 1.0
+# Ограничение SQLite на число параметров запроса с запасом.
+CHUNK_SIZE = 500
+# Сколько секунд ждать блокировки базы другим процессом.
+BUSY_TIMEOUT = 5.0
+SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT NOT NULL UNIQUE,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_stats SET entries = entries + 1, size = size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_stats SET entries = entries - 1, size = size - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache
+BEGIN
+    UPDATE cache_stats SET size = size - OLD.size + NEW.size;
+END;
+COMMIT;
+"""
+UPSERT = """
+INSERT INTO cache (key, value, expires, accessed, size)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value, expires = excluded.expires,
+    accessed = excluded.accessed, size = excluded.size
+"""
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+def key_kind(key):
+    for prefix, kind in KEY_KINDS:
+        if str(key).startswith(prefix):
+            return kind
+    return 'other'
+
+
+def count_read(cache_name, key, hit):
+    CACHE.inc(
+        cache=cache_name,
+        kind=key_kind(key),
+        result='hit' if hit else 'miss',
+    )
+
+
+@contextmanager
+def immediate(connection):
+    """Транзакция записи: блокировка берётся сразу, а не при UPDATE."""
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+def chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class CacheMetricsMixin:
+    """Считает попадания и промахи get() в метрике CACHE.
+
+    Имя кэша в метрике — его LOCATION.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self.metrics_name = name or 'default'
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version)
+        count_read(self.metrics_name, key, value is not MISSING)
+        return default if value is MISSING else value
+
+
+class InstrumentedLocMemCache(CacheMetricsMixin, LocMemCache):
+    pass
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для процессов; LOCATION — путь к файлу.
+
+    У каждого потока своё соединение, после fork оно открывается
+    заново. Попадания и промахи get() и get_many() идут в метрику
+    CACHE с именем кэша — именем файла.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_size = int(
+            params.get('max_size', options.get('MAX_SIZE', DEFAULT_MAX_SIZE)))
+        self.metrics_name = os.path.basename(location)
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        pid = os.getpid()
+        if getattr(self.local, 'pid', None) != pid:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA journal_mode = WAL')
+            # Потеря последних записей кэша при сбое питания не страшна.
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.executescript(SCHEMA)
+            self.local.connection = connection
+            self.local.pid = pid
+        return self.local.connection
+
+    def _keys(self, keys, version):
+        result = {}
+        for key in keys:
+            made = self.make_key(key, version=version)
+            self.validate_key(made)
+            result[made] = key
+        return result
+
+    def _fetch(self, keys, version):
+        """{исходный ключ: значение} непросроченных записей."""
+        made = self._keys(keys, version)
+        now = time.time()
+        found, stale = {}, []
+        for chunk in chunks(list(made)):
+            rows = self.connection.execute(
+                f'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))}) AND {ALIVE}',
+                [*chunk, now],
+            )
+            for key, value, accessed in rows:
+                found[made[key]] = pickle.loads(value)
+                if accessed < now - ACCESS_RESOLUTION:
+                    stale.append(key)
+        for key, original in made.items():
+            count_read(self.metrics_name, original, original in found)
+        if stale:
+            self._touch_accessed(stale, now)
+        return found
+
+    def _touch_accessed(self, keys, now):
+        connection = self.connection
+        connection.execute('PRAGMA busy_timeout = 0')
+        try:
+            for chunk in chunks(keys):
+                connection.execute(
+                    f'UPDATE cache SET accessed = ? '
+                    f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                    [now, *chunk],
+                )
+        except sqlite3.OperationalError:
+            # База занята записью: порядок LRU обновится при следующем
+            # чтении, ждать ради него не стоит.
+            pass
+        finally:
+            connection.execute(
+                f'PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}')
+
+    def _row(self, key, value, timeout, now):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        return key, blob, expires, now, len(key) + len(blob)
+
+    def _cull(self, connection, now):
+        entries, size = connection.execute(
+            'SELECT entries, size FROM cache_stats').fetchone()
+        if entries <= self._max_entries and size <= self.max_size:
+            return
+        if not self._cull_frequency:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute('DELETE FROM cache WHERE expires <= ?', [now])
+        keep = 1 - 1 / self._cull_frequency
+        max_entries = int(self._max_entries * keep)
+        max_size = int(self.max_size * keep)
+        while True:
+            entries, size = connection.execute(
+                'SELECT entries, size FROM cache_stats').fetchone()
+            if entries <= max_entries and size <= max_size:
+                return
+            batch = max(entries - max_entries, entries // 100, 1)
+            connection.execute(
+                'DELETE FROM cache WHERE rowid IN ('
+                'SELECT rowid FROM cache ORDER BY accessed LIMIT ?)',
+                [batch],
+            )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        connection = self.connection
+        with immediate(connection):
+            exists = connection.execute(
+                f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}', [key, now]
+            ).fetchone()
+            if exists:
+                return False
+            connection.execute(UPSERT, self._row(key, value, timeout, now))
+            self._cull(connection, now)
+        return True
+
+    def get(self, key, default=None, version=None):
+        return self._fetch([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        return self._fetch(keys, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = [
+            self._row(made, data[key], timeout, now)
+            for made, key in self._keys(data, version).items()
+        ]
+        connection = self.connection
+        with immediate(connection):
+            connection.executemany(UPSERT, rows)
+            self._cull(connection, now)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        cursor = self.connection.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            [self.get_backend_timeout(timeout), key, now],
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        made = list(self._keys(keys, version))
+        connection = self.connection
+        with immediate(connection):
+            for chunk in chunks(made):
+                connection.execute(
+                    f'DELETE FROM cache '
+                    f'WHERE key IN ({", ".join("?" * len(chunk))})',
+                    chunk,
+                )
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self.connection.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            [key, time.time()],
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов: чтение и запись в одной транзакции."""
+        made = self.make_key(key, version=version)
+        self.validate_key(made)
+        now = time.time()
+        connection = self.connection
+        with immediate(connection):
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {ALIVE}',
+                [made, now],
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                [blob, len(made) + len(blob), made],
+            )
+        return value
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
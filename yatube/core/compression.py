@@ -0,0 +1,125 @@
+"""Gzip-ответы, собранные из заранее сжатых кусков.
+
+Кусок — это raw deflate, закрытый Z_SYNC_FLUSH, то есть он
+заканчивается на границе байта. Поэтому сжатые заранее куски и
+куски, сжатые при выдаче, можно склеить в один поток, а в конце
+добавить пустой последний блок. Для CRC-32 всего тела распаковывать
+куски не нужно. Суммы складываются, как в crc32_combine из zlib, а
+оператор сдвига суммы на длину куска вычисляется один раз, при
+сжатии.
+"""
+import struct
+import zlib
+from typing import NamedTuple
+
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+# Пустой последний блок deflate: так заканчивается flush(Z_FINISH).
+FINAL_BLOCK = b'\x03\x00'
+CRC_POLYNOMIAL = 0xedb88320
+
+
+class Segment(NamedTuple):
+    compressed: bytes
+    crc: int
+    length: int
+    shift: tuple
+
+
+def _gf2_times(matrix, vector):
+    result = 0
+    index = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[index]
+        vector >>= 1
+        index += 1
+    return result
+
+
+def _gf2_square(matrix):
+    return [_gf2_times(matrix, row) for row in matrix]
+
+
+def crc32_shift(length):
+    """Оператор, дописывающий к CRC-32 length нулевых байт (как в zlib)."""
+    odd = [CRC_POLYNOMIAL] + [1 << bit for bit in range(31)]
+    even = _gf2_square(odd)
+    odd = _gf2_square(even)
+    result = [1 << bit for bit in range(32)]
+    while length:
+        even = _gf2_square(odd)
+        if length & 1:
+            result = [_gf2_times(even, row) for row in result]
+        length >>= 1
+        if not length:
+            break
+        odd = _gf2_square(even)
+        if length & 1:
+            result = [_gf2_times(odd, row) for row in result]
+        length >>= 1
+    return tuple(result)
+
+
+def deflate(data, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def compress_segment(data, level=6):
+    return Segment(
+        deflate(data, level),
+        zlib.crc32(data),
+        len(data),
+        crc32_shift(len(data)),
+    )
+
+
+def inflate(segment):
+    return zlib.decompressobj(-zlib.MAX_WBITS).decompress(segment.compressed)
+
+
+def gzip_body(parts):
+    """Тело gzip: Segment вставляется как есть, bytes сжимаются сейчас."""
+    crc = 0
+    length = 0
+    body = [GZIP_HEADER]
+    for part in parts:
+        if isinstance(part, Segment):
+            crc = _gf2_times(part.shift, crc) ^ part.crc
+            length += part.length
+            body.append(part.compressed)
+        else:
+            crc = zlib.crc32(part, crc)
+            length += len(part)
+            body.append(deflate(part, level=1))
+    body.append(FINAL_BLOCK)
+    body.append(struct.pack('<II', crc, length & 0xffffffff))
+    return b''.join(body)
+
+
+def coding_weights(header):
+    """{кодировка: q} из Accept-Encoding; q по умолчанию 1."""
+    weights = {}
+    for item in header.lower().split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+def accepts_gzip(request):
+    """Принимает ли клиент gzip: явно или через *, и только с q > 0."""
+    weights = coding_weights(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
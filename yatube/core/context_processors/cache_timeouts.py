@@ -0,0 +1,8 @@
+from django.conf import settings
+
+
+def cache_timeouts(request):
+    """Добавляет сроки жизни фрагментов шаблонов в кэше."""
+    return {
+        'post_card_cache_timeout': settings.POST_CARD_CACHE_TIMEOUT,
+    }
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from core import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживает базу SQLite: контрольная точка WAL, ANALYZE и '
+        'инкрементальный VACUUM'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--enable-incremental-vacuum',
+            action='store_true',
+            help='Один раз перевести базу в auto_vacuum=INCREMENTAL (VACUUM)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Повторять обслуживание каждые --interval секунд',
+        )
+        parser.add_argument('--interval', type=float, default=300.0)
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if options['enable_incremental_vacuum']:
+            if sqlite.enable_incremental_vacuum(alias):
+                self.stdout.write('Включён auto_vacuum=INCREMENTAL')
+        while True:
+            checkpointed = sqlite.checkpoint(alias)
+            sqlite.analyze(alias)
+            freed = sqlite.incremental_vacuum(alias)
+            self.stdout.write(
+                'Контрольная точка WAL '
+                + ('выполнена' if checkpointed else 'отложена: база занята')
+                + f', освобождено страниц {freed}'
+            )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
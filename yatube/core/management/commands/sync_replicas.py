@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.replication import sync_replicas
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу в реплики для чтения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Не завершаться, а обновлять реплики каждые --interval с',
+        )
+        parser.add_argument('--interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        while True:
+            sync_replicas()
+            if not options['loop']:
+                self.stdout.write(
+                    f'Обновлены реплики: {len(settings.DATABASE_REPLICAS)}')
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,222 @@
+"""Метрики в формате Prometheus, общие для всех процессов сервера.
+
+Каждый процесс пишет свои значения в собственный файл METRICS_DIR/
+<pid>.db, отображённый в память: запись — это сдвиг числа в mmap под
+локом потоков, без системных вызовов. Страница /metrics читает файлы
+всех процессов и складывает одинаковые ряды, поэтому счётчики
+воркеров pre-fork сервера не теряются и не дублируются.
+
+Файлы завершившихся процессов остаются и продолжают входить в сумму;
+при деплое каталог METRICS_DIR очищают перед запуском сервера.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+INITIAL_SIZE = 64 * 1024
+HEADER = struct.Struct('<I')
+DATA_START = 8
+KEY_LENGTH = struct.Struct('<I')
+VALUE = struct.Struct('<d')
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _padded(length):
+    return length + (-length) % 8
+
+
+class MetricsFile:
+    """Ряды метрик одного процесса: ключ — строка, значение — double.
+
+    Формат: 4 байта занятой длины, затем записи [длина ключа, ключ с
+    выравниванием до 8 байт, значение].
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        if os.path.getsize(path) < INITIAL_SIZE:
+            self.file.truncate(INITIAL_SIZE)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.positions = {}
+        self.used = HEADER.unpack_from(self.map, 0)[0] or DATA_START
+        for key, _, position in self.entries(self.map, self.used):
+            self.positions[key] = position
+
+    @staticmethod
+    def entries(buffer, used):
+        """(ключ, значение, смещение значения) всех рядов буфера."""
+        offset = DATA_START
+        while offset < used:
+            length = KEY_LENGTH.unpack_from(buffer, offset)[0]
+            offset += KEY_LENGTH.size
+            key = bytes(buffer[offset:offset + length]).decode()
+            offset += _padded(length)
+            yield key, VALUE.unpack_from(buffer, offset)[0], offset
+            offset += VALUE.size
+
+    def _add(self, key):
+        encoded = key.encode()
+        offset = self.used
+        end = offset + KEY_LENGTH.size + _padded(len(encoded)) + VALUE.size
+        if end > len(self.map):
+            self.map.close()
+            self.file.truncate(max(end, 2 * os.path.getsize(self.path)))
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        KEY_LENGTH.pack_into(self.map, offset, len(encoded))
+        self.map[offset + 4:offset + 4 + len(encoded)] = encoded
+        position = end - VALUE.size
+        VALUE.pack_into(self.map, position, 0.0)
+        self.used = end
+        HEADER.pack_into(self.map, 0, end)
+        self.positions[key] = position
+        return position
+
+    def inc(self, key, amount):
+        with self.lock:
+            position = self.positions.get(key)
+            if position is None:
+                position = self._add(key)
+            value = VALUE.unpack_from(self.map, position)[0]
+            VALUE.pack_into(self.map, position, value + amount)
+
+
+_file = None
+_file_owner = None
+_file_lock = threading.Lock()
+
+
+def process_file():
+    """Файл метрик текущего процесса; после fork открывается заново."""
+    global _file, _file_owner
+    owner = (os.getpid(), settings.METRICS_DIR)
+    if _file_owner != owner:
+        with _file_lock:
+            if _file_owner != owner:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                _file = MetricsFile(
+                    os.path.join(settings.METRICS_DIR, f'{owner[0]}.db'))
+                _file_owner = owner
+    return _file
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'),
+        )
+        for name, value in sorted(labels.items())
+    )
+    return f'{{{pairs}}}'
+
+
+REGISTRY = {}
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        REGISTRY[name] = self
+
+    def _inc(self, sample, labels, amount):
+        if settings.METRICS_ENABLED:
+            process_file().inc(
+                f'{self.name}\t{sample}{_labels(labels)}', amount)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self._inc(self.name, labels, amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        for bound in self.buckets:
+            if value <= bound:
+                self._inc(f'{self.name}_bucket', {**labels, 'le': bound}, 1)
+        self._inc(f'{self.name}_bucket', {**labels, 'le': '+Inf'}, 1)
+        self._inc(f'{self.name}_sum', labels, value)
+        self._inc(f'{self.name}_count', labels, 1)
+
+    @contextmanager
+    def time(self, **labels):
+        """Замеряет время блока; работает и как декоратор."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+def collect():
+    """Суммы рядов по файлам всех процессов: {метрика: {ряд: значение}}."""
+    samples = defaultdict(lambda: defaultdict(float))
+    if not os.path.isdir(settings.METRICS_DIR):
+        return samples
+    for filename in os.listdir(settings.METRICS_DIR):
+        if not filename.endswith('.db'):
+            continue
+        with open(os.path.join(settings.METRICS_DIR, filename), 'rb') as file:
+            data = file.read()
+        if len(data) < HEADER.size:
+            continue
+        used = HEADER.unpack_from(data, 0)[0]
+        for key, value, _ in MetricsFile.entries(data, used):
+            name, sample = key.split('\t', 1)
+            samples[name][sample] += value
+    return samples
+
+
+def exposition():
+    """Текст для Prometheus (text format 0.0.4)."""
+    samples = collect()
+    lines = []
+    for name, metric in sorted(REGISTRY.items()):
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for sample, value in sorted(samples.get(name, {}).items()):
+            lines.append(f'{sample} {value!r}')
+    return '\n'.join(lines) + '\n'
+
+
+REQUESTS = Counter(
+    'yatube_requests_total', 'Запросы к сайту по view, методу и статусу.')
+REQUEST_DURATION = Histogram(
+    'yatube_request_duration_seconds', 'Время ответа view.')
+PAGE_CACHE = Counter(
+    'yatube_page_cache_requests_total',
+    'Обращения к кэшу страниц по view: hit или miss.')
+CACHE = Counter(
+    'yatube_cache_requests_total',
+    'Чтения из кэшей Django по виду ключа: hit или miss.')
+SQL_QUERIES = Counter(
+    'yatube_sql_queries_total', 'SQL-запросы по view.')
+SQL_DURATION = Counter(
+    'yatube_sql_seconds_total', 'Суммарное время SQL-запросов по view.')
+IMAGE_INGEST = Histogram(
+    'yatube_image_ingest_seconds', 'Время приёма картинки поста.')
+THUMBNAILS = Histogram(
+    'yatube_thumbnail_seconds', 'Время построения миниатюр поста.')
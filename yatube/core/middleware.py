@@ -0,0 +1,144 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .metrics import REQUEST_DURATION, REQUESTS, SQL_DURATION, SQL_QUERIES
+from .profiling import RequestProfile
+from .queries import collect_queries
+from .routers import primary
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def view_name(request):
+    return getattr(request.resolver_match, 'view_name', None) or 'unresolved'
+
+
+class MetricsMiddleware:
+    """Считает запросы и время ответа каждого view, см. core.metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        view = view_name(request)
+        REQUEST_DURATION.observe(time.perf_counter() - start, view=view)
+        REQUESTS.inc(
+            view=view, method=request.method, status=response.status_code)
+        return response
+
+
+class SQLInstrumentationMiddleware:
+    """Считает SQL-запросы каждого запроса к сайту.
+
+    Итоги уходят в заголовки Server-Timing, X-SQL-Queries и
+    X-SQL-Time; превышение бюджета view из SQL_QUERY_BUDGETS и
+    повторяющиеся формы запросов (N+1) пишутся в лог. В тестах итоги
+    доступны как response.sql_stats.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_queries() as stats:
+            response = self.get_response(request)
+        view = view_name(request)
+        SQL_QUERIES.inc(stats.count, view=view)
+        SQL_DURATION.inc(stats.time, view=view)
+        duration = stats.time * 1000
+        response['Server-Timing'] = (
+            f'sql;dur={duration:.2f};desc="{stats.count} queries"')
+        response['X-SQL-Queries'] = str(stats.count)
+        response['X-SQL-Time'] = f'{duration:.2f}'
+        response.sql_stats = stats
+        budget = settings.SQL_QUERY_BUDGETS.get(view)
+        if budget is not None and stats.count > budget:
+            logger.warning(
+                'SQL budget exceeded for %s: %s queries > %s (%s)',
+                view, stats.count, budget, request.path)
+        repeated = stats.repeated(settings.SQL_REPEATED_QUERY_LIMIT)
+        for shape, count in repeated.items():
+            logger.warning(
+                'Possible N+1 in %s: %s × %s', view, count, shape)
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирует часть запросов, см. core.profiling.
+
+    Запрос профилируется, если его view есть в PROFILING_VIEWS, если
+    заголовок PROFILING_HEADER совпадает с PROFILING_TOKEN или с
+    вероятностью PROFILING_SAMPLE_RATE. Когда ни один способ не
+    включён, middleware отключается при старте и ничего не стоит.
+    """
+
+    def __init__(self, get_response):
+        if not (settings.PROFILING_SAMPLE_RATE
+                or settings.PROFILING_VIEWS
+                or settings.PROFILING_TOKEN):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace(
+            '-', '_')
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        profile = getattr(request, 'profile', None)
+        if profile is not None:
+            profile.stop()
+            profile.save()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name
+        if self.wanted(request, view_name):
+            request.profile = RequestProfile(view_name, request.path)
+            request.profile.start()
+
+    def wanted(self, request, view_name):
+        if view_name in settings.PROFILING_VIEWS:
+            return True
+        token = settings.PROFILING_TOKEN
+        if token and request.META.get(self.header) == token:
+            return True
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+class ReplicaRoutingMiddleware:
+    """Запросы на запись и чтение сразу после них идут в основную базу.
+
+    После запроса на запись клиент получает cookie на REPLICA_MAX_LAG
+    секунд: пока она есть, его запросы читают из основной базы и видят
+    свои изменения, даже если реплики ещё не обновились. View, которые
+    пишут на GET, помечаются core.routers.writes_database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        writes = request.method not in SAFE_METHODS
+        if writes or settings.PRIMARY_COOKIE_NAME in request.COOKIES:
+            with primary():
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        if writes or getattr(request, 'writes_database', False):
+            response.set_cookie(
+                settings.PRIMARY_COOKIE_NAME,
+                '1',
+                max_age=settings.REPLICA_MAX_LAG,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,141 @@
+"""Выборочное профилирование запросов к сайту.
+
+Для профилируемого запроса одновременно работают два профайлера:
+поток-сэмплер раз в PROFILING_INTERVAL секунд снимает стек потока
+запроса (collapsed stacks для flame graph), а cProfile собирает pstats.
+Результаты лежат в PROFILING_DIR, хранятся последние PROFILING_KEEP
+запросов.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+
+COLLAPSED = '.collapsed'
+PSTATS = '.pstats'
+META = '.json'
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f'{frame.f_globals.get("__name__", "?")}:{code.co_name}'
+
+
+class Sampler(threading.Thread):
+    """Периодически снимает стек потока thread_id."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profiling-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class RequestProfile:
+    """Профиль одного запроса: сэмплы, pstats и время выполнения."""
+
+    def __init__(self, view_name, path):
+        self.view_name = view_name
+        self.path = path
+        self.sampler = Sampler(
+            threading.get_ident(), settings.PROFILING_INTERVAL)
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.started = time.time()
+        self.start_time = time.perf_counter()
+        self.sampler.start()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.start_time
+
+    def save(self):
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        name = '{}-{}-{}'.format(
+            time.strftime('%Y%m%d%H%M%S', time.localtime(self.started)),
+            self.view_name.replace(':', '_'),
+            uuid.uuid4().hex[:8],
+        )
+        base = os.path.join(settings.PROFILING_DIR, name)
+        with open(base + COLLAPSED, 'w') as collapsed:
+            for stack, count in self.sampler.stacks.most_common():
+                collapsed.write(f'{stack} {count}\n')
+        self.profiler.dump_stats(base + PSTATS)
+        meta = {
+            'name': name,
+            'view': self.view_name,
+            'path': self.path,
+            'started': self.started,
+            'duration_ms': round(self.duration * 1000, 2),
+            'samples': sum(self.sampler.stacks.values()),
+        }
+        # Метаданные пишутся последними: по ним профиль виден в списке.
+        with open(base + META, 'w') as file:
+            json.dump(meta, file)
+        rotate()
+
+
+def profiles():
+    """Метаданные сохранённых профилей, от новых к старым."""
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    result = []
+    for filename in os.listdir(settings.PROFILING_DIR):
+        if not filename.endswith(META):
+            continue
+        path = os.path.join(settings.PROFILING_DIR, filename)
+        try:
+            with open(path) as file:
+                result.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return sorted(result, key=lambda meta: meta['started'], reverse=True)
+
+
+def rotate():
+    for meta in profiles()[settings.PROFILING_KEEP:]:
+        for suffix in (META, COLLAPSED, PSTATS):
+            path = os.path.join(settings.PROFILING_DIR, meta['name'] + suffix)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def slowest(limit=50):
+    return sorted(
+        profiles(), key=lambda meta: meta['duration_ms'], reverse=True
+    )[:limit]
+
+
+def profile_path(name, suffix):
+    """Путь к файлу профиля или None, если имя не из списка профилей."""
+    if suffix not in (COLLAPSED, PSTATS):
+        return None
+    if name not in {meta['name'] for meta in profiles()}:
+        return None
+    return os.path.join(settings.PROFILING_DIR, name + suffix)
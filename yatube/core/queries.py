@@ -0,0 +1,54 @@
+"""Учёт SQL-запросов, выполненных за время обработки запроса."""
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+# Списки параметров разной длины дают один и тот же «вид» запроса.
+IN_LIST_RE = re.compile(r'IN \((%s(, )?)+\)')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def query_shape(sql):
+    """Текст запроса без значений параметров."""
+    return IN_LIST_RE.sub('IN (...)', WHITESPACE_RE.sub(' ', sql)).strip()
+
+
+class QueryStats:
+    """Число, суммарное время и формы выполненных запросов.
+
+    Экземпляр передаётся в connection.execute_wrapper.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated(self, limit):
+        """Формы запросов, выполненные limit и более раз."""
+        return {
+            shape: count for shape, count in self.shapes.items()
+            if count >= limit
+        }
+
+
+@contextmanager
+def collect_queries():
+    """Собирает QueryStats по всем подключениям к базам."""
+    stats = QueryStats()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
@@ -0,0 +1,25 @@
+"""Обновление реплик SQLite копией основной базы.
+
+Копия снимается backup API SQLite: страницы основной базы пишутся в
+файл реплики, пока её читатели ждут блокировку. Реплика отстаёт от
+основной базы не больше чем на интервал между копиями.
+"""
+import sqlite3
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def sync_replica(alias):
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+
+
+def sync_replicas():
+    for alias in settings.DATABASE_REPLICAS:
+        sync_replica(alias)
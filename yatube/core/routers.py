@@ -0,0 +1,61 @@
+"""Чтение с реплик базы, запись в основную.
+
+Реплики перечислены в DATABASE_REPLICAS; это копии основной базы,
+которые обновляет команда sync_replicas (см. core.replication). Внутри
+primary() все запросы идут в основную базу: так читает пользователь,
+который только что что-то записал (см. ReplicaRoutingMiddleware).
+Внутри транзакции основной базы чтения тоже идут в неё: транзакция
+должна видеть свои записи.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_use_primary = ContextVar('use_primary', default=False)
+
+
+@contextmanager
+def primary():
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def writes_database(view):
+    """Помечает view, которое пишет в базу на запрос GET.
+
+    Такое view читает основную базу, а ReplicaRoutingMiddleware ставит
+    клиенту cookie, как после запроса на запись.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.writes_database = True
+        with primary():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if (_use_primary.get() or not settings.DATABASE_REPLICAS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
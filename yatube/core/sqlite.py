@@ -0,0 +1,76 @@
+"""Настройка соединений SQLite и обслуживание базы.
+
+Каждое новое соединение получает прагмы из SQLITE_PRAGMAS: журнал WAL
+(читатели не ждут писателя), synchronous=NORMAL (fsync только при
+контрольной точке), отображение файла в память, больший кэш страниц и
+ожидание блокировки вместо немедленной ошибки «database is locked».
+
+WAL растёт, пока его не перенесёт в базу контрольная точка, статистика
+планировщика устаревает, а удалённые страницы остаются в файле. Всё это
+делает команда sqlite_maintenance, которую запускают по расписанию или
+с --loop.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# auto_vacuum=INCREMENTAL, см. PRAGMA auto_vacuum.
+INCREMENTAL = 2
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Прагмы выполняются прямо на соединении sqlite3: настройка
+    # соединения не попадает в SQL-статистику запроса, который его открыл.
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def checkpoint(alias=DEFAULT_DB_ALIAS):
+    """Переносит WAL в базу и обрезает его.
+
+    Возвращает False, если читатели или писатель помешали перенести
+    журнал целиком; тогда он перенесётся при следующем запуске.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        busy, _, _ = cursor.fetchone()
+    return not busy
+
+
+def analyze(alias=DEFAULT_DB_ALIAS):
+    """Обновляет статистику планировщика по выборке строк из индексов."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            f'PRAGMA analysis_limit = {settings.SQLITE_ANALYSIS_LIMIT}')
+        cursor.execute('ANALYZE')
+
+
+def enable_incremental_vacuum(alias=DEFAULT_DB_ALIAS):
+    """Включает auto_vacuum=INCREMENTAL; нужен один полный VACUUM."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] == INCREMENTAL:
+            return False
+        cursor.execute(f'PRAGMA auto_vacuum = {INCREMENTAL}')
+        cursor.execute('VACUUM')
+    return True
+
+
+def free_pages(cursor):
+    cursor.execute('PRAGMA freelist_count')
+    return cursor.fetchone()[0]
+
+
+def incremental_vacuum(alias=DEFAULT_DB_ALIAS):
+    """Возвращает ОС до SQLITE_VACUUM_PAGES свободных страниц."""
+    with connections[alias].cursor() as cursor:
+        before = free_pages(cursor)
+        cursor.execute(
+            f'PRAGMA incremental_vacuum({settings.SQLITE_VACUUM_PAGES})')
+        # Прагма освобождает по странице за шаг: шаги нужно выбрать.
+        cursor.fetchall()
+        return before - free_pages(cursor)
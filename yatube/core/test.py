@@ -1,4 +1,35 @@
-from django.test import TestCase
+import gzip
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from core import compression, metrics, profiling, replication, sqlite
+from core.cache import SQLiteCache
+from core.queries import query_shape
+from posts import outbox
+from posts.caching import TAG_KEY, post_tags
+from posts.models import FeedEntry, Follow, Post
+
+PROFILING_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+METRICS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 class ViewTestClass(TestCase):
@@ -11,3 +42,436 @@ class ViewTestClass(TestCase):
         response = self.client.get('login')
         self.assertEqual(response.status_code, 403)
         self.assertTemplateUsed(response, 'core/403csrf.html')
+
+
+class SQLInstrumentationTests(TestCase):
+    def test_headers(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            response['X-SQL-Queries'], str(response.sql_stats.count))
+        self.assertTrue(response['Server-Timing'].startswith('sql;dur='))
+
+    @override_settings(SQL_QUERY_BUDGETS={'posts:index': 0})
+    def test_budget_exceeded_logged(self):
+        cache.clear()
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+
+    def test_query_shape(self):
+        self.assertEqual(
+            query_shape('SELECT *\n  FROM t WHERE id IN (%s, %s, %s)'),
+            query_shape('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+
+@override_settings(
+    PROFILING_DIR=PROFILING_DIR,
+    PROFILING_VIEWS=['posts:index'],
+    PROFILING_TOKEN='secret',
+    PROFILING_KEEP=2,
+)
+class ProfilingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+        self.staff_client = Client()
+        self.staff_client.force_login(get_user_model().objects.create_user(
+            username='staff', is_staff=True))
+
+    def test_profiles_selected_requests(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('about:author'))
+        self.client.get(reverse('about:tech'), HTTP_X_PROFILE='secret')
+        self.client.get(reverse('about:tech'), HTTP_X_PROFILE='wrong')
+        self.assertEqual(
+            sorted(meta['view'] for meta in profiling.profiles()),
+            ['about:tech', 'posts:index'],
+        )
+
+    def test_rotation(self):
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(len(profiling.profiles()), 2)
+
+    def test_slow_requests_page(self):
+        self.client.get(reverse('posts:index'))
+        url = reverse('core:slow_requests')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        response = self.staff_client.get(url)
+        meta, = response.context['profiles']
+        self.assertEqual(meta['view'], 'posts:index')
+        for kind in ('collapsed', 'pstats'):
+            with self.subTest(kind=kind):
+                response = self.staff_client.get(reverse(
+                    'core:profile_file', args=[meta['name'], kind]))
+                self.assertEqual(response.status_code, 200)
+        response = self.staff_client.get(
+            reverse('core:profile_file', args=[meta['name'], 'json']))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(METRICS_DIR=METRICS_DIR)
+class MetricsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        # Файл процесса был в удалённом каталоге: открыть заново.
+        metrics._file_owner = None
+        cache.clear()
+
+    def test_sums_files_of_all_processes(self):
+        os.makedirs(METRICS_DIR)
+        for pid, amount in ((1, 2), (2, 3)):
+            metrics.MetricsFile(os.path.join(METRICS_DIR, f'{pid}.db')).inc(
+                'yatube_requests_total\tyatube_requests_total{view="a"}',
+                amount)
+        self.assertEqual(
+            metrics.collect()['yatube_requests_total'],
+            {'yatube_requests_total{view="a"}': 5.0},
+        )
+
+    def test_file_grows(self):
+        os.makedirs(METRICS_DIR)
+        path = os.path.join(METRICS_DIR, '1.db')
+        file = metrics.MetricsFile(path)
+        for index in range(2000):
+            file.inc(f'name\tsample_{index:040}', index)
+        reopened = metrics.MetricsFile(path)
+        self.assertEqual(len(reopened.positions), 2000)
+        samples = metrics.collect()['name']
+        self.assertEqual(samples[f'sample_{1999:040}'], 1999.0)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_page(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.client.get(url)
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        for line in (
+            'yatube_requests_total{method="GET",status="200",'
+            'view="posts:index"} 2.0',
+            'yatube_request_duration_seconds_count{view="posts:index"} 2.0',
+            'yatube_page_cache_requests_total{page="index_page",'
+            'result="hit"} 1.0',
+            'yatube_page_cache_requests_total{page="index_page",'
+            'result="miss"} 1.0',
+            '# TYPE yatube_request_duration_seconds histogram',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, text)
+        self.assertIn('yatube_sql_queries_total{view="posts:index"}', text)
+        self.assertIn(
+            'kind="page",result="hit"}', text)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_access(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(
+            self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong')
+            .status_code,
+            403,
+        )
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(
+                self.client.get(url, HTTP_AUTHORIZATION='Bearer ')
+                .status_code,
+                403,
+            )
+        staff = get_user_model().objects.create_user(
+            username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        self.cache = self.new_cache()
+
+    def new_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_operations(self):
+        cache = self.cache
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 2))
+        self.assertTrue(cache.add('other', 2))
+        cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            cache.get_many(['a', 'b', 'missing']), {'a': 1, 'b': 2})
+        self.assertEqual(cache.incr('a', 10), 11)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.delete_many(['a', 'b'])
+        self.assertIsNone(cache.get('a'))
+        cache.set('expired', 1, 0)
+        self.assertFalse(cache.has_key('expired'))
+        self.assertFalse(cache.touch('expired'))
+        cache.clear()
+        self.assertIsNone(cache.get('key'))
+
+    def test_shared_between_instances(self):
+        self.cache.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_atomic_incr_across_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=increment, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_evicts_least_recently_used(self):
+        cache = self.new_cache(MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache.connection.execute(
+            "UPDATE cache SET accessed = accessed - 100 WHERE key LIKE '%b'")
+        cache.get('b')
+        cache.connection.execute(
+            "UPDATE cache SET accessed = accessed - 10 WHERE key LIKE '%a'")
+        cache.set('d', 'd')
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']),
+                         {'b': 'b', 'd': 'd'})
+
+    def test_read_does_not_wait_for_writer(self):
+        self.cache.set('key', 'value')
+        self.cache.connection.execute(
+            'UPDATE cache SET accessed = accessed - 100')
+        writer = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(writer.close)
+        writer.execute('BEGIN IMMEDIATE')
+        start = time.monotonic()
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertLess(time.monotonic() - start, 1)
+        writer.execute('ROLLBACK')
+
+    def test_size_cap(self):
+        cache = self.new_cache(MAX_SIZE=100_000)
+        for index in range(50):
+            cache.set(index, b'0' * 10_000)
+        entries, size = cache.connection.execute(
+            'SELECT entries, size FROM cache_stats').fetchone()
+        self.assertLessEqual(size, 100_000)
+        self.assertEqual(
+            len(cache.get_many(range(50))), entries)
+        self.assertIn(49, cache.get_many([49]))
+
+
+class CompressionTests(TestCase):
+    def test_gzip_from_segments(self):
+        parts = [b'<html>' * 1000, b'hole', b'', b'x' * 70000, b'end']
+        body = compression.gzip_body(
+            compression.compress_segment(part) if index % 2 == 0 else part
+            for index, part in enumerate(parts)
+        )
+        self.assertEqual(gzip.decompress(body), b''.join(parts))
+
+    def test_accepts_gzip(self):
+        cases = (
+            ('gzip, deflate, br', True),
+            ('deflate;q=1.0, gzip;q=0.5', True),
+            ('*', True),
+            ('gzip;q=0, identity', False),
+            ('gzip; q=0.000, *;q=1', False),
+            ('*;q=0', False),
+            ('identity', False),
+            ('', False),
+        )
+        for header, expected in cases:
+            with self.subTest(header=header):
+                request = RequestFactory().get(
+                    '/', HTTP_ACCEPT_ENCODING=header)
+                self.assertIs(compression.accepts_gzip(request), expected)
+
+    def test_inflate(self):
+        segment = compression.compress_segment(b'text' * 100)
+        self.assertEqual(compression.inflate(segment), b'text' * 100)
+
+
+def temporary_database(alias):
+    """Добавляет базу SQLite во временном файле; возвращает её удаление."""
+    directory = tempfile.mkdtemp()
+    connections.databases[alias] = {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.path.join(directory, f'{alias}.sqlite3'),
+    }
+
+    def remove():
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+        shutil.rmtree(directory)
+    return remove
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.remove_database = temporary_database('replica')
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.remove_database()
+
+    def setUp(self):
+        cache.clear()
+        self.author = get_user_model().objects.create_user(username='author')
+        replication.sync_replicas()
+        self.post = Post.objects.create(author=self.author, text='text')
+        self.url = reverse('posts:post_detail', args=[self.post.id])
+
+    def age_tags(self):
+        """Теги поста изменились давно: страница читается с реплики."""
+        old = f'{int(time.time()) - 60}.old'
+        cache.set_many(
+            {TAG_KEY.format(tag): old for tag in post_tags(self.post.id)},
+            None,
+        )
+
+    def test_reads_from_replica(self):
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.age_tags()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        replication.sync_replica('replica')
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_recently_changed_pages_read_primary(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_get_write_sets_cookie(self):
+        follower = get_user_model().objects.create_user(username='follower')
+        self.client.force_login(follower)
+        replication.sync_replicas()
+        response = self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        self.assertIn(settings.PRIMARY_COOKIE_NAME, response.cookies)
+
+    def test_reads_in_transaction_primary(self):
+        with transaction.atomic():
+            self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+
+    def test_outbox_reads_primary(self):
+        follower = get_user_model().objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.author)
+        outbox.process_all()
+        self.assertTrue(FeedEntry.objects.using('default').filter(
+            user=follower, post=self.post).exists())
+
+    def test_read_your_writes(self):
+        self.client.force_login(self.author)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': 'comment'},
+        )
+        cookie = response.cookies[settings.PRIMARY_COOKIE_NAME]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_MAX_LAG)
+        self.age_tags()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        del self.client.cookies[settings.PRIMARY_COOKIE_NAME]
+        self.client.logout()
+        cache.clear()
+        self.age_tags()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class SQLiteTests(TestCase):
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            for name in ('busy_timeout', 'cache_size'):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(
+                    cursor.fetchone()[0], settings.SQLITE_PRAGMAS[name])
+            cursor.execute('PRAGMA synchronous')
+            # synchronous=NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class SQLiteMaintenanceTests(TransactionTestCase):
+    databases = {'maintained'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.remove_database = temporary_database('maintained')
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.remove_database()
+
+    def test_atomic_takes_write_lock(self):
+        """atomic сразу блокирует запись, даже если сначала читает."""
+        other = sqlite3.connect(
+            connections['maintained'].settings_dict['NAME'],
+            timeout=0,
+            isolation_level=None,
+        )
+        self.addCleanup(other.close)
+        with transaction.atomic(using='maintained'):
+            with self.assertRaisesRegex(sqlite3.OperationalError, 'locked'):
+                other.execute('BEGIN IMMEDIATE')
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+
+    def test_maintenance_command(self):
+        with connections['maintained'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('CREATE TABLE filler (data BLOB)')
+            for _ in range(100):
+                cursor.execute(
+                    'INSERT INTO filler VALUES (?)', [b'0' * 10_000])
+            cursor.execute('DELETE FROM filler')
+        out = StringIO()
+        call_command(
+            'sqlite_maintenance',
+            database='maintained',
+            enable_incremental_vacuum=True,
+            stdout=out,
+        )
+        self.assertIn('auto_vacuum=INCREMENTAL', out.getvalue())
+        with connections['maintained'].cursor() as cursor:
+            cursor.execute('INSERT INTO filler VALUES (?)', [b'0' * 100_000])
+            cursor.execute('DELETE FROM filler')
+        self.assertGreater(sqlite.incremental_vacuum('maintained'), 0)
+        self.assertTrue(sqlite.checkpoint('maintained'))
+        self.assertEqual(
+            os.path.getsize(
+                connections['maintained'].settings_dict['NAME'] + '-wal'),
+            0,
+        )
@@ -0,0 +1,72 @@
+import copy
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def isolated_caches():
+    """CACHES, в которых кэш по умолчанию лежит во временном каталоге.
+
+    Тесты и бенчмарки очищают кэш и не должны стирать кэш сервера
+    разработки.
+    """
+    caches = copy.deepcopy(settings.CACHES)
+    caches['default']['LOCATION'] = os.path.join(
+        tempfile.gettempdir(), 'yatube-test-cache.sqlite3')
+    return caches
+
+
+class TestRunner(DiscoverRunner):
+    """Запуск тестов с кэшем из isolated_caches()."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches_override = override_settings(CACHES=isolated_caches())
+        self.caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches_override.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+class QueryBudgetMixin:
+    """Проверки SQL-бюджетов view для TestCase.
+
+    Требует SQLInstrumentationMiddleware: она прикладывает к ответу
+    тестового клиента статистику запросов.
+    """
+
+    def assertWithinQueryBudget(self, response):
+        view_name = response.resolver_match.view_name
+        self.assertIn(
+            view_name,
+            settings.SQL_QUERY_BUDGETS,
+            f'Для {view_name} не задан SQL-бюджет',
+        )
+        stats = response.sql_stats
+        budget = settings.SQL_QUERY_BUDGETS[view_name]
+        self.assertLessEqual(
+            stats.count,
+            budget,
+            f'{view_name}: {stats.count} SQL-запросов при бюджете {budget}',
+        )
+        repeated = stats.repeated(settings.SQL_REPEATED_QUERY_LIMIT)
+        self.assertEqual(
+            repeated, {}, f'{view_name}: повторяющиеся запросы (N+1)')
+
+
+class CommitCallbacksMixin:
+    """Вызов transaction.on_commit в TestCase.
+
+    TestCase не фиксирует транзакцию теста, и функции, отложенные до
+    фиксации, копятся в соединении невызванными.
+    """
+
+    def runCommitCallbacks(self):
+        callbacks, connection.run_on_commit = connection.run_on_commit, []
+        for _, callback in callbacks:
+            callback()
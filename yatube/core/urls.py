@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('', views.slow_requests, name='slow_requests'),
+    path('<str:name>/<str:kind>/', views.profile_file, name='profile_file'),
+]
@@ -1,4 +1,17 @@
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+)
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics, profiling
 
 
 def page_not_found(request, exception):
@@ -8,3 +21,37 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def slow_requests(request):
+    """Самые медленные из недавно профилированных запросов."""
+    context = {'profiles': profiling.slowest()}
+    return render(request, 'core/profiles.html', context)
+
+
+@staff_member_required
+def profile_file(request, name, kind):
+    path = profiling.profile_path(name, f'.{kind}')
+    if path is None or not os.path.exists(path):
+        raise Http404
+    return FileResponse(
+        open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
+
+
+def has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    return bool(token) and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+
+
+def metrics_view(request):
+    """Метрики всех процессов сервера для Prometheus.
+
+    Prometheus передаёт METRICS_TOKEN в заголовке Authorization,
+    сотрудники смотрят страницу после входа.
+    """
+    if not (request.user.is_staff or has_metrics_token(request)):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.exposition(), content_type='text/plain; version=0.0.4')
@@ -0,0 +1,237 @@
+"""JSON API только для чтения: посты, группы, профили, комментарии.
+
+Списки отдаются страницами CursorPaginator, как в HTML-ленте:
+    GET /api/v1/posts/?cursor=...&limit=50&fields=id,text,author
+
+fields выбирает поля ответа, и из базы читаются только их столбцы;
+соединение с автором или группой делается, только если они выбраны.
+Страница сериализуется по одной записи в потоковый ответ. Как и HTML-
+страницы, ответы помечаются версиями тегов кэша (ETag, Last-Modified),
+и клиент с актуальной версией получает 304 без обращения к базе.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.fields.files import FieldFile
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from .caching import (
+    author_tags,
+    comments_tags,
+    conditional_tagged,
+    group_tags,
+    index_tags,
+    post_tags,
+)
+from .models import Comment, Group, Post, User, UserStats
+from .utils import CursorPaginator
+
+# Поле ответа: путь к значению и связь, которую нужно присоединить.
+POST_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', None),
+    'edited': ('edited', None),
+    'author': ('author__username', 'author'),
+    'group': ('group__slug', 'group'),
+    'image': ('image', None),
+    'comments_count': ('comments_count', None),
+}
+COMMENT_FIELDS = {
+    'id': ('id', None),
+    'post': ('post_id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', None),
+    'author': ('author__username', 'author'),
+}
+encoder = DjangoJSONEncoder()
+
+
+class BadRequest(Exception):
+    pass
+
+
+def api_view(view):
+    """Ошибки в JSON; только GET и HEAD."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        except Http404:
+            return JsonResponse({'error': 'not found'}, status=404)
+    return wrapper
+
+
+def tagged(tags):
+    """conditional_tagged для тегов, зависящих только от аргументов view."""
+    return conditional_tagged(lambda request, **kwargs: tags(**kwargs))
+
+
+def tagged_posts(tags):
+    """tagged для списков постов.
+
+    Если выбрано поле comments_count, в ETag входят и теги счётчиков
+    комментариев: новый комментарий меняет только их.
+    """
+    def list_tags(request, **kwargs):
+        result = tags(**kwargs)
+        if 'comments_count' in selected_fields(request, POST_FIELDS):
+            result += comments_tags(result)
+        return result
+    return conditional_tagged(list_tags)
+
+
+def selected_fields(request, available):
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(available)
+    fields = fields.split(',')
+    unknown = set(fields) - set(available)
+    if unknown:
+        raise BadRequest(f'unknown fields: {", ".join(sorted(unknown))}')
+    return fields
+
+
+def page_size(request):
+    limit = request.GET.get('limit', settings.API_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise BadRequest('limit must be an integer')
+    if not 1 <= limit <= settings.API_MAX_PAGE_SIZE:
+        raise BadRequest(
+            f'limit must be between 1 and {settings.API_MAX_PAGE_SIZE}')
+    return limit
+
+
+def only_fields(queryset, available, fields):
+    """Читает из базы только столбцы выбранных полей и ключи курсора."""
+    columns = {'pub_date'}
+    related = set()
+    for field in fields:
+        path, relation = available[field]
+        columns.add(path)
+        if relation:
+            columns.add(relation)
+            related.add(relation)
+    if related:
+        # select_related() без аргументов присоединил бы все связи.
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+def value(obj, path):
+    for name in path.split('__'):
+        if obj is None:
+            return None
+        obj = getattr(obj, name)
+    if isinstance(obj, FieldFile):
+        return obj.url if obj else None
+    return obj
+
+
+def serialize(obj, available, fields):
+    return encoder.encode(
+        {field: value(obj, available[field][0]) for field in fields})
+
+
+def stream_page(page, available, fields):
+    yield '{{"next": {}, "previous": {}, "results": ['.format(
+        encoder.encode(page.next_cursor),
+        encoder.encode(page.previous_cursor),
+    )
+    for index, obj in enumerate(page):
+        yield (',' if index else '') + serialize(obj, available, fields)
+    yield ']}'
+
+
+def list_response(request, queryset, available, descending=True):
+    fields = selected_fields(request, available)
+    paginator = CursorPaginator(
+        only_fields(queryset, available, fields),
+        page_size(request),
+        descending=descending,
+    )
+    page = paginator.page(request.GET.get('cursor'))
+    return StreamingHttpResponse(
+        stream_page(page, available, fields),
+        content_type='application/json',
+    )
+
+
+def object_response(obj, available, fields):
+    return JsonResponse(
+        {field: value(obj, available[field][0]) for field in fields})
+
+
+@api_view
+@tagged_posts(index_tags)
+def posts(request):
+    return list_response(request, Post.objects.all(), POST_FIELDS)
+
+
+@api_view
+@tagged(post_tags)
+def post(request, post_id):
+    fields = selected_fields(request, POST_FIELDS)
+    queryset = only_fields(Post.objects.all(), POST_FIELDS, fields)
+    return object_response(
+        get_object_or_404(queryset, pk=post_id), POST_FIELDS, fields)
+
+
+@api_view
+@tagged(post_tags)
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('id'), pk=post_id)
+    return list_response(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        COMMENT_FIELDS,
+        descending=False,
+    )
+
+
+@api_view
+@tagged(group_tags)
+def group(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return JsonResponse({
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+    })
+
+
+@api_view
+@tagged_posts(group_tags)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return list_response(request, group.posts.all(), POST_FIELDS)
+
+
+@api_view
+@tagged(author_tags)
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    stats = getattr(author, 'stats', UserStats())
+    return JsonResponse({
+        'username': author.username,
+        'full_name': author.get_full_name(),
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+    })
+
+
+@api_view
+@tagged_posts(author_tags)
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return list_response(request, author.posts.all(), POST_FIELDS)
@@ -0,0 +1,369 @@
+import hashlib
+import time
+import uuid
+from contextlib import nullcontext
+from functools import partial, wraps
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from core.compression import (
+    accepts_gzip,
+    compress_segment,
+    gzip_body,
+    inflate,
+)
+from core.metrics import PAGE_CACHE
+from core.routers import primary
+
+from . import follow_graph
+from .models import Post
+from .holes import fill_response, make_personal, render_marker, split
+
+TAG_KEY = 'cache_tag:{}'
+PAGE_KEY = 'page:{}.{}'
+POST_AUTHOR_KEY = 'post_author:{}'
+
+
+def index_tags():
+    return ['feed:index']
+
+
+def group_tags(slug):
+    return [f'group:{slug}']
+
+
+def author_tags(username):
+    return [f'author:{username}']
+
+
+def post_tags(post_id):
+    return [f'post:{post_id}']
+
+
+def comments_tags(tags):
+    """Теги счётчиков комментариев у постов лент с тегами tags.
+
+    Отдельные от тегов лент: HTML-ленты счётчик не выводят, и новый
+    комментарий не должен сбрасывать их кэш.
+    """
+    return [f'comments:{tag}' for tag in tags]
+
+
+def post_author_id(post_id):
+    """Id автора поста; автор поста не меняется, поэтому кэш бессрочный.
+
+    При промахе имя автора тем же запросом кладётся в кэш имён графа
+    подписок.
+    """
+    key = POST_AUTHOR_KEY.format(post_id)
+    author_id = cache.get(key)
+    if author_id is None:
+        author = Post.objects.filter(pk=post_id).values_list(
+            'author_id', 'author__username').first()
+        if author is None:
+            return None
+        author_id, username = author
+        cache.set(key, author_id, None)
+        cache.set(
+            follow_graph.USERNAME_KEY.format(author_id), username,
+            settings.FOLLOW_GRAPH_TIMEOUT)
+    return author_id
+
+
+def post_detail_tags(post_id):
+    """Теги страницы поста: на ней выводится и статистика автора."""
+    author_id = post_author_id(post_id)
+    if author_id is None:
+        return post_tags(post_id)
+    return [
+        *post_tags(post_id),
+        *(tag for username in follow_graph.usernames([author_id])
+          for tag in author_tags(username)),
+    ]
+
+
+def follow_tags(request):
+    """Теги ленты подписок: авторы, на которых подписан пользователь."""
+    usernames = follow_graph.usernames(
+        follow_graph.following(request.user.pk))
+    return [
+        tag for username in sorted(usernames)
+        for tag in author_tags(username)
+    ]
+
+
+def post_page_tags(post, previous_group_slug=None):
+    """Теги всех страниц, на которых выводится пост."""
+    tags = [
+        *index_tags(),
+        *post_tags(post.pk),
+        *author_tags(post.author.username),
+    ]
+    slugs = {previous_group_slug}
+    if post.group_id:
+        slugs.add(post.group.slug)
+    for slug in slugs - {None}:
+        tags += group_tags(slug)
+    return tags
+
+
+def author_page_tags(author, previous_username=None):
+    """Теги всех страниц, на которых выводится имя автора.
+
+    Кроме его профиля и постов это ленты: главная и группы его постов.
+    """
+    tags = [*index_tags()]
+    for username in sorted({author.username, previous_username} - {None}):
+        tags += author_tags(username)
+    slugs = (
+        Post.objects.filter(author=author, group__isnull=False)
+        .values_list('group__slug', flat=True)
+        .distinct()
+    )
+    for slug in sorted(slugs):
+        tags += group_tags(slug)
+    return tags
+
+
+def group_page_tags(group, previous_slug=None):
+    """Теги всех страниц, на которых выводится группа.
+
+    Кроме лент это страницы её постов и профили их авторов.
+    """
+    tags = [*index_tags()]
+    for slug in {group.slug, previous_slug} - {None}:
+        tags += group_tags(slug)
+    posts = group.posts.values_list('pk', 'author__username')
+    usernames = set()
+    for post_id, username in posts.iterator():
+        tags += post_tags(post_id)
+        usernames.add(username)
+    for username in sorted(usernames):
+        tags += author_tags(username)
+    return tags
+
+
+def new_version():
+    """Версия тега: время изменения в секундах и случайная часть."""
+    return f'{int(time.time())}.{uuid.uuid4().hex}'
+
+
+def tag_versions(tags):
+    """Текущие версии тегов; отсутствующим тегам выдаются новые."""
+    keys = [TAG_KEY.format(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate_tags(*tags):
+    """Сбрасывает все закэшированные ответы, помеченные тегами.
+
+    Версия тега входит в ключ кэша, поэтому новая версия делает
+    старые записи недостижимыми, и они вытесняются по таймауту.
+    """
+    cache.set_many({TAG_KEY.format(tag): new_version() for tag in tags}, None)
+
+
+def invalidate_tags_on_commit(*tags):
+    """invalidate_tags для изменений в транзакции: сейчас и после фиксации.
+
+    Параллельный запрос между сбросом и фиксацией прочитает старые
+    строки и сохранит устаревшую страницу под новой версией тегов —
+    повторный сброс после фиксации её вытесняет. Немедленный сброс
+    оставлен для кода без фиксации: TestCase откатывает транзакцию и
+    не вызывает on_commit.
+    """
+    invalidate_tags(*tags)
+    transaction.on_commit(partial(invalidate_tags, *tags))
+
+
+def fingerprint(versions):
+    return hashlib.md5(':'.join(versions).encode()).hexdigest()
+
+
+def follow_version(request):
+    """Версия подписок посетителя для ETag страниц с кнопками подписки.
+
+    Id пользователя берётся из сессии, без запроса пользователя; у
+    анонимного посетителя кнопок нет.
+    """
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
+        return ''
+    return follow_graph.version(user_id)
+
+
+def validators(request, versions, *personal):
+    """ETag и Last-Modified страницы по версиям её тегов.
+
+    Страница меняется только вместе с версиями тегов, поэтому
+    валидаторы считаются без отрисовки. В ETag входит сессия:
+    персональные части страницы у каждого пользователя свои, а вход и
+    выход меняют ключ сессии. Сессия берётся из cookie, без запроса к
+    базе. personal — версии другого состояния, от которого зависят
+    персональные части, например follow_version.
+    """
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+    etag = fingerprint([*versions, session, *personal])
+    modified = [
+        int(version.partition('.')[0]) for version in versions
+        if version.partition('.')[0].isdigit()
+    ]
+    # Слабый ETag: тело отдаётся и сжатым, и несжатым.
+    return f'W/"{etag}"', max(modified, default=None)
+
+
+def not_modified(request, etag, last_modified):
+    """304 Not Modified, если у клиента актуальная версия, иначе None."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code != 200:
+        return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def reading_fresh(last_modified):
+    """Основная база для страниц, теги которых изменились недавно.
+
+    Реплика могла ещё не получить изменение, а отрисованная по ней
+    страница запомнилась бы клиентом или кэшем под новой версией тегов.
+    Версии тегов хранят время с точностью до секунды, отсюда запас.
+    """
+    if (last_modified is not None
+            and time.time() - last_modified <= settings.REPLICA_MAX_LAG + 1):
+        return primary()
+    return nullcontext()
+
+
+def conditional_tagged(tags):
+    """Отвечает 304, пока не изменились версии тегов страницы.
+
+    tags получает запрос и именованные аргументы view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag, last_modified = validators(
+                request, tag_versions(tags(request, **kwargs)))
+            response = not_modified(request, etag, last_modified)
+            if response is None:
+                with reading_fresh(last_modified):
+                    response = view(request, *args, **kwargs)
+                response = set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+class CachedPage(NamedTuple):
+    """Страница в кэше: сжатые куски между метками и тексты меток."""
+    content_type: str
+    charset: str
+    segments: list
+    holes: list
+
+
+def cached_page(response):
+    """CachedPage из ответа view или None, если ответ не кэшируется."""
+    if (response.status_code != 200 or response.streaming
+            or response.cookies
+            or 'html' not in response.get('Content-Type', '')):
+        return None
+    statics, holes = split(response.content.decode(response.charset))
+    return CachedPage(
+        response['Content-Type'],
+        response.charset,
+        [compress_segment(text.encode(response.charset)) for text in statics],
+        holes,
+    )
+
+
+def interleave(segments, holes):
+    for segment, hole in zip(segments, [*holes, None]):
+        yield segment
+        if hole is not None:
+            yield hole
+
+
+def page_response(request, page):
+    """Ответ из кэша: сжатые куски отдаются как есть, метки заполняются."""
+    holes = [
+        render_marker(request, hole).encode(page.charset)
+        for hole in page.holes
+    ]
+    if accepts_gzip(request):
+        content = gzip_body(interleave(page.segments, holes))
+    else:
+        content = b''.join(
+            interleave([inflate(segment) for segment in page.segments], holes))
+    response = HttpResponse(content, content_type=page.content_type)
+    if accepts_gzip(request):
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return make_personal(response)
+
+
+def cache_page_tagged(timeout, key_prefix, tags, follow_holes=False):
+    """Кэш страниц, ключ которого зависит от версий тегов страницы.
+
+    tags получает именованные аргументы view и возвращает список
+    тегов. Страница кэшируется одна на всех посетителей: персональные
+    части шаблоны выводят тегом {% hole %}, и они заполняются при
+    каждой выдаче (см. posts.holes). В кэше лежат только сжатые gzip
+    куски страницы: клиентам с Accept-Encoding: gzip они отдаются без
+    пересжатия, остальным распаковываются. Если у клиента актуальная
+    версия страницы, он получает 304 ещё до обращения к кэшу.
+
+    follow_holes — на странице есть кнопки подписки: тогда в ETag
+    входит и версия подписок посетителя.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            versions = tag_versions(tags(**kwargs))
+            personal = [follow_version(request)] if follow_holes else []
+            etag, last_modified = validators(request, versions, *personal)
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+            key = PAGE_KEY.format(key_prefix, fingerprint(
+                [*versions, request.build_absolute_uri()]))
+            page = cache.get(key)
+            PAGE_CACHE.inc(
+                page=key_prefix, result='miss' if page is None else 'hit')
+            if page is None:
+                request.punching_holes = True
+                try:
+                    with reading_fresh(last_modified):
+                        response = view(request, *args, **kwargs)
+                finally:
+                    request.punching_holes = False
+                page = cached_page(response)
+                if page is None:
+                    return fill_response(request, response)
+                cache.set(key, page, timeout)
+            response = page_response(request, page)
+            return set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
@@ -0,0 +1,66 @@
+"""Потребители событий posts.outbox: входящие ленты и поисковый индекс.
+
+Когда автор переходит порог рассылки, меняется версия авторов без
+рассылки в графе подписок: ленты подписчиков перестают или начинают
+подмешивать его посты.
+
+Ленты подписок помечены тегами авторов, а страница могла отрисоваться
+между записью и рассылкой. Поэтому после изменения входящих лент теги
+автора сбрасываются ещё раз, когда транзакция потребителя сохранена.
+"""
+from django.db import transaction
+
+from . import feeds, follow_graph, search, thumbnails
+from .caching import author_tags, invalidate_tags
+from .models import Post, User
+from .outbox import handles
+
+
+def invalidate_author(author_id):
+    username = User.objects.filter(pk=author_id).values_list(
+        'username', flat=True).first()
+    if username is not None:
+        transaction.on_commit(
+            lambda: invalidate_tags(*author_tags(username)))
+
+
+@handles('feeds', 'post.created')
+def fan_out_post(payload):
+    post = Post.objects.filter(pk=payload['post_id']).first()
+    if post is not None:
+        feeds.fan_out(post)
+        invalidate_author(post.author_id)
+
+
+@handles('feeds', 'follow.created')
+def backfill_feed(payload):
+    if feeds.fanout_stopped(payload['author_id']):
+        transaction.on_commit(follow_graph.pulled_changed)
+    feeds.backfill(payload['user_id'], payload['author_id'])
+    invalidate_author(payload['author_id'])
+
+
+@handles('feeds', 'follow.deleted')
+def prune_feed(payload):
+    feeds.prune(payload['user_id'], payload['author_id'])
+    if payload.get('fanout_resumed'):
+        feeds.backfill_followers(payload['author_id'])
+        transaction.on_commit(follow_graph.pulled_changed)
+    invalidate_author(payload['author_id'])
+
+
+@handles('search', 'post.created', 'post.updated')
+def index_post_text(payload):
+    post = Post.objects.filter(pk=payload['post_id']).first()
+    if post is not None:
+        search.index_post(post)
+
+
+@handles('search', 'post.deleted')
+def unindex_post_text(payload):
+    search.unindex_post(payload['post_id'])
+
+
+@handles('thumbnails', 'thumbnails.requested')
+def generate_thumbnails(payload):
+    thumbnails.generate(payload['post_id'])
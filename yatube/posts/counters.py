@@ -0,0 +1,87 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from . import follow_graph
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _shifted(field, delta):
+    return Greatest(F(field) + delta, 0)
+
+
+def change_user_stats(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на заданные величины."""
+    changes = {
+        field: _shifted(field, delta) for field, delta in deltas.items()
+    }
+    if UserStats.objects.filter(user_id=user_id).update(**changes):
+        return
+    if all(delta > 0 for delta in deltas.values()):
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shifted('comments_count', delta))
+
+
+def _actual_count(model, field):
+    """Подзапрос с реальным числом строк model, ссылающихся на запись."""
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+def reconcile_user_stats(batch_size=500):
+    """Пересчитывает счётчики пользователей; возвращает число исправленных."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True)
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in missing.iterator()),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+    drifted = list(
+        UserStats.objects.annotate(
+            actual_posts=_actual_count(Post, 'author'),
+            actual_followers=_actual_count(Follow, 'author'),
+            actual_following=_actual_count(Follow, 'user'),
+        ).filter(
+            ~Q(posts_count=F('actual_posts'))
+            | ~Q(followers_count=F('actual_followers'))
+            | ~Q(following_count=F('actual_following'))
+        )
+    )
+    for stats in drifted:
+        stats.posts_count = stats.actual_posts
+        stats.followers_count = stats.actual_followers
+        stats.following_count = stats.actual_following
+    UserStats.objects.bulk_update(
+        drifted,
+        ['posts_count', 'followers_count', 'following_count'],
+        batch_size=batch_size,
+    )
+    if drifted:
+        # Исправленные счётчики подписчиков могли перейти порог рассылки.
+        follow_graph.pulled_changed()
+    return len(drifted)
+
+
+def reconcile_comments_count(batch_size=500):
+    """Пересчитывает счётчики комментариев; возвращает число исправленных."""
+    drifted = list(
+        Post.objects.annotate(
+            actual_comments=_actual_count(Comment, 'post'),
+        ).exclude(comments_count=F('actual_comments')).only('pk')
+    )
+    for post in drifted:
+        post.comments_count = post.actual_comments
+    Post.objects.bulk_update(
+        drifted, ['comments_count'], batch_size=batch_size)
+    return len(drifted)
@@ -0,0 +1,144 @@
+from django.conf import settings
+from django.db.models import Q
+
+from . import follow_graph
+from .models import FeedEntry, Follow, Post, UserStats
+from .utils import paginate
+
+FEED_KEYS = ('pub_date', 'post_id')
+
+
+def is_fanout_author(author_id):
+    """Рассылаются ли посты автора во входящие ленты подписчиков."""
+    return not UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def fanout_resumed(author_id):
+    """Вернулся ли автор к рассылке: подписчиков снова FEED_FANOUT_LIMIT.
+
+    Вызывается после отписки, когда счётчик уже уменьшен.
+    """
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def fanout_stopped(author_id):
+    """Перестал ли автор рассылать посты: подписчиков стало больше
+    FEED_FANOUT_LIMIT.
+
+    Вызывается после подписки, когда счётчик уже увеличен.
+    """
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.FEED_FANOUT_LIMIT + 1,
+    ).exists()
+
+
+def pulled_authors(user):
+    """Авторы из подписок пользователя, чьи посты читаются без рассылки."""
+    return follow_graph.pulled(user.pk).tolist()
+
+
+def fan_out(post):
+    """Раскладывает новый пост во входящие ленты подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post.id,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if not is_fanout_author(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('id', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_followers(author_id):
+    """Добавляет посты автора в ленты всех его подписчиков.
+
+    Пока автор был без рассылки, его новые посты в ленты не попадали;
+    после возврата к рассылке ленты читаются без подмешивания.
+    """
+    if not is_fanout_author(author_id):
+        return
+    posts = list(Post.objects.filter(
+        author_id=author_id).values_list('id', 'pub_date'))
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id in followers.iterator()
+            for post_id, pub_date in posts
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def follow_feed_page(user, page_number, cursor=None):
+    """Страница ленты подписок.
+
+    Обычно это диапазон по входящей ленте пользователя. Если среди
+    подписок есть авторы без рассылки, их посты подмешиваются к
+    входящей ленте в том же порядке (pub_date, id).
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    pulled = pulled_authors(user)
+    if pulled:
+        posts = Post.objects.filter(
+            Q(id__in=entries.values('post_id')) | Q(author_id__in=pulled)
+        ).select_related('author', 'group')
+        return paginate(posts, page_number, cursor=cursor)
+    page_obj = paginate(
+        entries.select_related('post__author', 'post__group')
+        .order_by('-pub_date', '-post_id'),
+        page_number,
+        cursor=cursor,
+        keys=FEED_KEYS,
+    )
+    page_obj.object_list = [entry.post for entry in page_obj.object_list]
+    return page_obj
@@ -0,0 +1,161 @@
+"""Граф подписок в общем кэше.
+
+Для каждого пользователя хранится отсортированный массив id авторов,
+на которых он подписан (array, 8 байт на подписку). Проверка подписки —
+двоичный поиск, список подписок — чтение одного ключа; SQL нужен
+только при промахе. Подписка и отписка меняют массив на месте, а не
+сбрасывают его.
+
+Изменение массива — это чтение и запись без блокировки: одновременные
+подписки одного пользователя из разных процессов могут потерять одно
+изменение. Поэтому у записей есть срок жизни FOLLOW_GRAPH_TIMEOUT.
+
+Каждое изменение подписок пользователя меняет и его версию графа: она
+входит в ETag страниц с кнопками подписки (см. posts.caching).
+
+Рядом с подписками тем же запросом загружаются авторы без рассылки
+(больше FEED_FANOUT_LIMIT подписчиков), чьи посты лента подмешивает
+при чтении. Запись помечена общей версией: когда автор переходит
+порог рассылки, версия меняется, и записи всех пользователей
+перезагружаются при следующем чтении.
+"""
+import uuid
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Follow, User
+
+FOLLOWING_KEY = 'follow_graph:following:{}'
+PULLED_KEY = 'follow_graph:pulled:{}'
+PULLED_VERSION_KEY = 'follow_graph:pulled_version'
+USERNAME_KEY = 'follow_graph:username:{}'
+VERSION_KEY = 'follow_graph:version:{}'
+TYPECODE = 'q'
+
+
+def _load(user_id):
+    """Подписки и авторы без рассылки одним запросом."""
+    rows = sorted(
+        Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', 'author__stats__followers_count'))
+    ids = array(TYPECODE, (author_id for author_id, _ in rows))
+    pulled = array(TYPECODE, (
+        author_id for author_id, followers in rows
+        if (followers or 0) > settings.FEED_FANOUT_LIMIT
+    ))
+    cache.set_many(
+        {
+            FOLLOWING_KEY.format(user_id): ids,
+            PULLED_KEY.format(user_id): (pulled_version(), pulled),
+        },
+        settings.FOLLOW_GRAPH_TIMEOUT,
+    )
+    return ids, pulled
+
+
+def following(user_id):
+    """Отсортированный массив id авторов, на которых подписан user_id."""
+    ids = cache.get(FOLLOWING_KEY.format(user_id))
+    if ids is None:
+        ids, _ = _load(user_id)
+    return ids
+
+
+def pulled(user_id):
+    """Отсортированный массив id авторов без рассылки из подписок."""
+    entry = cache.get(PULLED_KEY.format(user_id))
+    if entry is None or entry[0] != pulled_version():
+        _, ids = _load(user_id)
+        return ids
+    return entry[1]
+
+
+def contains(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def is_following(user_id, author_id):
+    return contains(following(user_id), author_id)
+
+
+def version(user_id):
+    """Версия подписок пользователя; меняется при каждом изменении."""
+    key = VERSION_KEY.format(user_id)
+    value = cache.get(key)
+    if value is None:
+        value = uuid.uuid4().hex
+        cache.set(key, value, settings.FOLLOW_GRAPH_TIMEOUT)
+    return value
+
+
+def pulled_version():
+    """Общая версия авторов без рассылки."""
+    value = cache.get(PULLED_VERSION_KEY)
+    if value is None:
+        value = uuid.uuid4().hex
+        cache.set(PULLED_VERSION_KEY, value, settings.FOLLOW_GRAPH_TIMEOUT)
+    return value
+
+
+def pulled_changed():
+    """Автор перешёл порог рассылки: авторы без рассылки перезагрузятся."""
+    cache.set(
+        PULLED_VERSION_KEY, uuid.uuid4().hex, settings.FOLLOW_GRAPH_TIMEOUT)
+
+
+def _change(user_id, change):
+    """Меняет закэшированный массив; отсутствующий загрузится при чтении.
+
+    Авторы без рассылки среди подписок перезагружаются при чтении.
+    """
+    key = FOLLOWING_KEY.format(user_id)
+    ids = cache.get(key)
+    if ids is not None:
+        change(ids)
+        cache.set(key, ids, settings.FOLLOW_GRAPH_TIMEOUT)
+    cache.delete(PULLED_KEY.format(user_id))
+    cache.set(
+        VERSION_KEY.format(user_id), uuid.uuid4().hex,
+        settings.FOLLOW_GRAPH_TIMEOUT)
+
+
+def add(user_id, author_id):
+    def insert(ids):
+        if not contains(ids, author_id):
+            insort(ids, author_id)
+    _change(user_id, insert)
+
+
+def remove(user_id, author_id):
+    def delete(ids):
+        if contains(ids, author_id):
+            del ids[bisect_left(ids, author_id)]
+    _change(user_id, delete)
+
+
+def usernames(user_ids):
+    """Имена пользователей по id; известные имена читаются из кэша."""
+    keys = {user_id: USERNAME_KEY.format(user_id) for user_id in user_ids}
+    cached = cache.get_many(keys.values())
+    names = {
+        user_id: cached[key] for user_id, key in keys.items()
+        if key in cached
+    }
+    missing = set(keys) - set(names)
+    if missing:
+        loaded = dict(User.objects.filter(pk__in=missing).values_list(
+            'pk', 'username'))
+        cache.set_many(
+            {keys[pk]: username for pk, username in loaded.items()},
+            settings.FOLLOW_GRAPH_TIMEOUT,
+        )
+        names.update(loaded)
+    return [names[user_id] for user_id in user_ids if user_id in names]
+
+
+def forget_username(user_id):
+    cache.delete(USERNAME_KEY.format(user_id))
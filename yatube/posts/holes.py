@@ -0,0 +1,136 @@
+"""Персональные части общих закэшированных страниц.
+
+Страницы с cache_page_tagged кэшируются одни на всех посетителей.
+Всё, что зависит от пользователя, шаблоны выводят тегом {% hole %}:
+при отрисовке такой страницы на его месте остаётся метка, а при
+каждой выдаче, из кэша или свежей, метки заменяются фрагментами для
+текущего запроса. На остальных страницах тег сразу выводит фрагмент.
+
+Текст пользователей экранируется, поэтому подделать метку в посте
+или комментарии нельзя.
+"""
+import re
+from urllib.parse import quote, unquote
+
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.safestring import mark_safe
+
+from . import follow_graph
+from .forms import CommentForm
+
+HOLES = {}
+MARKER = re.compile(r'<!--hole ([^<>]+?)-->')
+
+
+def hole(name):
+    """Регистрирует функцию (request, *args) -> HTML под именем name."""
+    def decorator(func):
+        HOLES[name] = func
+        return func
+    return decorator
+
+
+def marker(name, *args):
+    words = [name, *(quote(str(arg), safe='') for arg in args)]
+    return mark_safe(f'<!--hole {" ".join(words)}-->')
+
+
+def render_hole(request, name, *args):
+    return HOLES[name](request, *(str(arg) for arg in args))
+
+
+def render_marker(request, text):
+    name, *args = text.split(' ')
+    return render_hole(request, name, *map(unquote, args))
+
+
+def fill(request, content):
+    return MARKER.sub(
+        lambda match: render_marker(request, match.group(1)), content)
+
+
+def split(content):
+    """Куски страницы между метками и тексты самих меток."""
+    parts = MARKER.split(content)
+    return parts[0::2], parts[1::2]
+
+
+def make_personal(response):
+    """Ответ с заполненными метками свой у каждого пользователя.
+
+    Браузер хранит его у себя, но перед показом сверяет ETag.
+    """
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def fill_response(request, response):
+    if response.streaming or 'html' not in response.get('Content-Type', ''):
+        return response
+    response.content = fill(request, response.content.decode(response.charset))
+    if response.has_header('Content-Length'):
+        response['Content-Length'] = str(len(response.content))
+    return make_personal(response)
+
+
+@hole('header')
+def header(request):
+    return render_to_string('includes/header.html', request=request)
+
+
+@hole('feed_switcher')
+def feed_switcher(request, active):
+    context = {'index': active == 'index', 'follow': active == 'follow'}
+    return render_to_string(
+        'posts/includes/switcher.html', context, request)
+
+
+def following(request):
+    """Подписки пользователя читаются из кэша один раз за запрос."""
+    if not hasattr(request, '_following'):
+        request._following = follow_graph.following(request.user.pk)
+    return request._following
+
+
+def render_follow_button(request, template, username, author_id):
+    user = request.user
+    if not user.is_authenticated or user.username == username:
+        return ''
+    context = {
+        'username': username,
+        'following': follow_graph.contains(
+            following(request), int(author_id)),
+    }
+    return render_to_string(template, context, request)
+
+
+@hole('follow_button')
+def follow_button(request, username, author_id):
+    return render_follow_button(
+        request, 'posts/includes/follow_button.html', username, author_id)
+
+
+@hole('card_follow_button')
+def card_follow_button(request, username, author_id):
+    return render_follow_button(
+        request, 'posts/includes/card_follow_button.html',
+        username, author_id)
+
+
+@hole('comment_form')
+def comment_form(request, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    context = {'post_id': post_id, 'form': CommentForm()}
+    return render_to_string(
+        'posts/includes/comment_form.html', context, request)
+
+
+@hole('post_edit_link')
+def post_edit_link(request, post_id, author_id):
+    if str(request.user.pk) != author_id:
+        return ''
+    return render_to_string(
+        'posts/includes/post_edit_link.html', {'post_id': post_id}, request)
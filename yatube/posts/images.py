@@ -0,0 +1,87 @@
+"""Приём картинок постов с ограниченным расходом памяти.
+
+Загрузки целиком пишутся во временные файлы (FILE_UPLOAD_HANDLERS),
+а картинка декодируется не больше одного раза:
+
+* размер файла и размеры картинки проверяются по заголовку, до
+  декодирования пикселей;
+* огромные JPEG декодируются сразу в уменьшенном масштабе (draft),
+  остальные форматы уменьшаются через reduce;
+* число декодируемых пикселей ограничено IMAGE_DECODE_PIXELS_LIMIT.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from PIL import Image
+
+from core.metrics import IMAGE_INGEST
+
+# Запас по размеру для reduce перед финальным ресемплингом: даёт
+# качество, близкое к полному ресемплингу, за долю памяти.
+REDUCING_GAP = 2.0
+
+
+def fit(size, max_side):
+    """Размер, вписанный в квадрат max_side с сохранением пропорций."""
+    width, height = size
+    scale = min(1, max_side / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def check_header(upload):
+    """Отклоняет файл по размеру и размерам картинки без декодирования."""
+    if upload.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            code='file_too_large',
+            params={'limit': settings.IMAGE_UPLOAD_MAX_SIZE // 2 ** 20},
+        )
+    width, height = upload.image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение %(width)s×%(height)s слишком большое.',
+            code='image_too_large',
+            params={'width': width, 'height': height},
+        )
+
+
+def downscale(image, max_side):
+    """Уменьшает картинку, не превышая бюджет декодированных пикселей."""
+    target = fit(image.size, max_side)
+    # JPEG декодируется в масштабе 1/2–1/8, не меньше целевого размера.
+    image.draft(None, target)
+    width, height = image.size
+    if width * height > settings.IMAGE_DECODE_PIXELS_LIMIT:
+        raise ValidationError(
+            'Изображение %(width)s×%(height)s слишком большое.',
+            code='image_too_large',
+            params={'width': width, 'height': height},
+        )
+    image.thumbnail(target, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+    return image
+
+
+@IMAGE_INGEST.time()
+def ingest(upload):
+    """Проверяет загруженную картинку и при необходимости уменьшает её.
+
+    Картинки в пределах IMAGE_INGEST_MAX_SIZE сохраняются как есть,
+    без перекодирования. Большие пересохраняются в том же формате
+    поверх загруженного файла: после уменьшения пиксели уже в памяти,
+    и исходник больше не нужен.
+    """
+    check_header(upload)
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if max(image.size) <= settings.IMAGE_INGEST_MAX_SIZE:
+            upload.seek(0)
+            return upload
+        image_format = image.format
+        image = downscale(image, settings.IMAGE_INGEST_MAX_SIZE)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        upload.seek(0)
+        upload.truncate()
+        image.save(upload, image_format)
+    upload.size = upload.tell()
+    upload.seek(0)
+    return upload
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.synthetic import SyntheticData
+
+
+class Command(BaseCommand):
+    help = 'Наполняет базу синтетическими пользователями, постами и подписками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument(
+            '--comments-per-post', type=float, default=2.0,
+            help='Среднее число комментариев к посту',
+        )
+        parser.add_argument(
+            '--follows-per-user', type=int, default=20,
+            help='Среднее число подписок пользователя',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой, от 0 до 1',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона активности авторов',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--skip-feed',
+            action='store_true',
+            help='Не заполнять входящие ленты подписчиков',
+        )
+
+    def handle(self, *args, **options):
+        data = SyntheticData(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments_per_post=options['comments_per_post'],
+            follows_per_user=options['follows_per_user'],
+            images=options['images'],
+            alpha=options['alpha'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            feed=not options['skip_feed'],
+        )
+        start = time.perf_counter()
+        data.generate()
+        total = time.perf_counter() - start
+        for name, rows, seconds in data.stats:
+            self.stdout.write(
+                f'{name:<24} {rows:>12} rows {seconds:8.1f} s '
+                f'{rows / max(seconds, 1e-9):>12.0f} rows/s'
+            )
+        self.stdout.write(
+            f'{"comments":<24} {data.comments_created:>12} rows')
+        self.stdout.write(
+            f'{"feed entries":<24} {data.feed_created:>12} rows')
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные сгенерированы за {total:.1f} s'))
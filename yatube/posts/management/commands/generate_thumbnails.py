@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры картинок новых и изменённых постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Не завершаться, а ждать новые картинки',
+        )
+        parser.add_argument('--interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        # Очередь обходится один раз по возрастанию id: посты с битыми
+        # картинками не перебираются заново, а заменённые картинки
+        # старых постов ставит в очередь событие thumbnails.requested.
+        after_id = 0
+        while True:
+            done, last_id = process_pending(
+                options['workers'], options['batch_size'], after_id)
+            if done:
+                self.stdout.write(f'Готовы миниатюры постов: {done}')
+            if last_id is not None:
+                after_id = last_id
+                continue
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.outbox import process_all, prune
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает события об изменениях постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Не завершаться, а ждать новые события',
+        )
+        parser.add_argument('--interval', type=float, default=1.0)
+        parser.add_argument(
+            '--prune-interval',
+            type=float,
+            default=60.0,
+            help='Как часто удалять обработанные события, в секундах',
+        )
+
+    def handle(self, *args, **options):
+        pruned_at = None
+        while True:
+            done = process_all(options['batch_size'])
+            if done:
+                self.stdout.write(f'Обработано событий: {done}')
+            # События обычно обрабатываются после ответа в процессах
+            # сервера, поэтому удаление не зависит от того, нашлись ли
+            # события здесь.
+            now = time.monotonic()
+            if (pruned_at is None
+                    or now - pruned_at >= options['prune_interval']):
+                deleted = prune()
+                if deleted:
+                    self.stdout.write(f'Удалено событий: {deleted}')
+                pruned_at = now
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_comments_count, reconcile_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users = reconcile_user_stats(batch_size)
+        posts = reconcile_comments_count(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: пользователей {users}, постов {posts}'
+        ))
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_thumbnails_ready'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('aggregate', models.CharField(max_length=20, verbose_name='агрегат')),
+                ('aggregate_id', models.PositiveIntegerField(verbose_name='id агрегата')),
+                ('kind', models.CharField(max_length=50, verbose_name='тип')),
+                ('payload', models.TextField(verbose_name='данные')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='дата')),
+            ],
+            options={
+                'verbose_name': 'событие',
+                'verbose_name_plural': 'события',
+            },
+        ),
+        migrations.CreateModel(
+            name='OutboxPosition',
+            fields=[
+                ('consumer', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='потребитель')),
+                ('last_event_id', models.PositiveIntegerField(default=0, verbose_name='последнее событие')),
+            ],
+            options={
+                'verbose_name': 'позиция потребителя',
+                'verbose_name_plural': 'позиции потребителей',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxFailure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumer', models.CharField(max_length=50, verbose_name='потребитель')),
+                ('event_id', models.PositiveIntegerField(verbose_name='событие')),
+                ('kind', models.CharField(max_length=50, verbose_name='тип')),
+                ('payload', models.TextField(verbose_name='данные')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='попытки')),
+                ('error', models.TextField(verbose_name='ошибка')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='дата')),
+            ],
+            options={
+                'verbose_name': 'ошибка обработки события',
+                'verbose_name_plural': 'ошибки обработки событий',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='outboxfailure',
+            constraint=models.UniqueConstraint(fields=('consumer', 'event_id'), name='unique_outbox_failure'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:30
+
+import json
+
+from django.db import migrations, models
+
+
+def queue_thumbnails(apps, schema_editor):
+    # Миниатюры, построенные до этой миграции, не записаны в посте:
+    # все картинки заново ставятся в очередь на генерацию.
+    Post = apps.get_model('posts', 'Post')
+    OutboxEvent = apps.get_model('posts', 'OutboxEvent')
+    posts = Post.objects.exclude(image='')
+    posts.update(thumbnails_ready=False)
+    OutboxEvent.objects.bulk_create(
+        (
+            OutboxEvent(
+                aggregate='post',
+                aggregate_id=post_id,
+                kind='thumbnails.requested',
+                payload=json.dumps({'post_id': post_id}),
+            )
+            for post_id in posts.values_list('id', flat=True).iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_outbox_failure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails',
+            field=models.TextField(blank=True, editable=False, verbose_name='миниатюры'),
+        ),
+        migrations.RunPython(queue_thumbnails, migrations.RunPython.noop),
+    ]
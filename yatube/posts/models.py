@@ -24,6 +24,10 @@ class Group(models.Model):
 class Post(models.Model):
     text = models.TextField(max_length=300, verbose_name='текст')
     pub_date = models.DateTimeField(auto_now_add=True, verbose_name='дата')
+    edited = models.DateTimeField(
+        auto_now=True,
+        verbose_name='дата изменения'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -43,16 +47,56 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
     )
+    thumbnails_ready = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='миниатюры готовы'
+    )
+    # JSON: пресет из POST_THUMBNAIL_PRESETS -> имя файла миниатюры.
+    thumbnails = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='миниатюры'
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='количество комментариев'
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         default_related_name = 'posts'
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
+        indexes = [
+            models.Index(
+                fields=['pub_date'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Счётчик комментариев меняется только через F() в сигналах,
+        # поэтому при правке поста его значение из памяти не пишется.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count'
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -77,6 +121,12 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date'],
+                name='comment_post_pub_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -103,3 +153,146 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Запись во входящей ленте подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write), поэтому
+    лента подписок читается одним диапазоном по индексу (user, pub_date).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField(verbose_name='дата')
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'],
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые иначе пришлось бы считать при чтении.
+
+    Обновляются атомарно через F() в сигналах; расхождения исправляет
+    команда reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='количество постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='количество подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='количество подписок'
+    )
+
+    class Meta:
+        verbose_name = 'счётчики пользователя'
+        verbose_name_plural = 'счётчики пользователей'
+
+
+class OutboxEvent(models.Model):
+    """Событие об изменении поста, комментария или подписки.
+
+    Пишется в той же транзакции, что и само изменение, поэтому событие
+    есть тогда и только тогда, когда изменение сохранилось. Потребители
+    из posts.outbox читают события по возрастанию id, то есть в порядке
+    изменений каждого агрегата.
+    """
+    aggregate = models.CharField(max_length=20, verbose_name='агрегат')
+    aggregate_id = models.PositiveIntegerField(verbose_name='id агрегата')
+    kind = models.CharField(max_length=50, verbose_name='тип')
+    payload = models.TextField(verbose_name='данные')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='дата')
+
+    class Meta:
+        verbose_name = 'событие'
+        verbose_name_plural = 'события'
+
+
+class OutboxPosition(models.Model):
+    """Последнее событие, обработанное потребителем."""
+    consumer = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name='потребитель'
+    )
+    last_event_id = models.PositiveIntegerField(
+        default=0,
+        verbose_name='последнее событие'
+    )
+
+    class Meta:
+        verbose_name = 'позиция потребителя'
+        verbose_name_plural = 'позиции потребителей'
+
+
+class OutboxFailure(models.Model):
+    """Ошибка обработчика на событии.
+
+    Пока попыток меньше OUTBOX_MAX_ATTEMPTS, потребитель повторяет
+    событие при следующей обработке; после этого пропускает его, а
+    запись остаётся для разбора вместе с копией данных события.
+    """
+    consumer = models.CharField(max_length=50, verbose_name='потребитель')
+    event_id = models.PositiveIntegerField(verbose_name='событие')
+    kind = models.CharField(max_length=50, verbose_name='тип')
+    payload = models.TextField(verbose_name='данные')
+    attempts = models.PositiveIntegerField(
+        default=0, verbose_name='попытки')
+    error = models.TextField(verbose_name='ошибка')
+    updated = models.DateTimeField(auto_now=True, verbose_name='дата')
+
+    class Meta:
+        verbose_name = 'ошибка обработки события'
+        verbose_name_plural = 'ошибки обработки событий'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['consumer', 'event_id'],
+                name='unique_outbox_failure'
+            )
+        ]
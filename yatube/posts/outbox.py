@@ -0,0 +1,160 @@
+"""Исходящие события (transactional outbox) и их потребители.
+
+Сигналы моделей добавляют OutboxEvent в транзакцию записи, а дорогая
+работа — рассылка по лентам, поисковый индекс — делается потребителями
+позже: после отправки ответа в том же процессе или командой
+process_outbox.
+
+Потребитель — набор обработчиков событий с общей позицией в потоке:
+
+    @handles('feeds', 'post.created')
+    def fan_out(payload):
+        ...
+
+Потребитель берёт события пачками по порядку id и сдвигает позицию в
+той же транзакции, что и изменения обработчиков, поэтому изменения в
+базе применяются ровно один раз. Обработчики всё равно должны быть
+идемпотентными: так их можно перезапустить по всей истории.
+
+Ошибка обработчика откатывает только его событие и записывается в
+OutboxFailure; потребитель останавливается на этом событии и
+повторяет его при следующей обработке, а после OUTBOX_MAX_ATTEMPTS
+попыток пропускает. Другие потребители от него не зависят.
+"""
+import json
+import logging
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models import F, Min
+from django.dispatch import receiver
+
+from core.routers import primary
+
+from .models import OutboxEvent, OutboxFailure, OutboxPosition
+
+logger = logging.getLogger(__name__)
+
+CONSUMERS = {}
+_appended = ContextVar('outbox_appended', default=False)
+
+
+def handles(consumer, *kinds):
+    """Регистрирует функцию (payload) -> None для событий kinds."""
+    def decorator(func):
+        handlers = CONSUMERS.setdefault(consumer, {})
+        for kind in kinds:
+            handlers[kind] = func
+        return func
+    return decorator
+
+
+def append(aggregate, aggregate_id, kind, **payload):
+    OutboxEvent.objects.create(
+        aggregate=aggregate,
+        aggregate_id=aggregate_id,
+        kind=kind,
+        payload=json.dumps(payload),
+    )
+    _appended.set(True)
+
+
+def process(consumer, batch_size=None):
+    """Обрабатывает следующую пачку событий; возвращает её размер.
+
+    Обработчики читают основную базу: реплика может ещё не содержать
+    строк, записанных вместе с событием.
+    """
+    handlers = CONSUMERS[consumer]
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    OutboxPosition.objects.get_or_create(consumer=consumer)
+    with primary(), transaction.atomic():
+        # Запись в начале транзакции блокирует позицию: другой процесс
+        # дождётся её и не обработает те же события второй раз.
+        OutboxPosition.objects.filter(consumer=consumer).update(
+            last_event_id=F('last_event_id'))
+        position = OutboxPosition.objects.get(consumer=consumer)
+        events = list(
+            OutboxEvent.objects.filter(id__gt=position.last_event_id)
+            .order_by('id')[:batch_size]
+        )
+        done = []
+        for event in events:
+            if not handle(consumer, handlers, event):
+                break
+            done.append(event)
+        if done:
+            position.last_event_id = done[-1].id
+            position.save(update_fields=['last_event_id'])
+    return len(done)
+
+
+def handle(consumer, handlers, event):
+    """Обрабатывает событие; False — повторить его в следующий раз."""
+    handler = handlers.get(event.kind)
+    if handler is None:
+        return True
+    try:
+        with transaction.atomic():
+            handler(json.loads(event.payload))
+    except Exception as error:
+        failure, _ = OutboxFailure.objects.get_or_create(
+            consumer=consumer,
+            event_id=event.id,
+            defaults={'kind': event.kind, 'payload': event.payload},
+        )
+        failure.attempts += 1
+        failure.error = repr(error)
+        failure.save()
+        skip = failure.attempts >= settings.OUTBOX_MAX_ATTEMPTS
+        logger.exception(
+            'Outbox consumer %s failed on event %s (attempt %s)%s',
+            consumer, event.id, failure.attempts,
+            ', skipping' if skip else '',
+        )
+        return skip
+    return True
+
+
+def process_all(batch_size=None):
+    """Обрабатывает все накопившиеся события; возвращает их число."""
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    done = 0
+    for consumer in CONSUMERS:
+        try:
+            while True:
+                count = process(consumer, batch_size)
+                done += count
+                # Неполная пачка: события кончились или обработчик упал,
+                # и событие повторится при следующей обработке.
+                if count < batch_size:
+                    break
+        except Exception:
+            logger.exception('Outbox consumer %s failed', consumer)
+    return done
+
+
+def prune():
+    """Удаляет события, которые обработали все потребители."""
+    OutboxPosition.objects.bulk_create(
+        [OutboxPosition(consumer=consumer) for consumer in CONSUMERS],
+        ignore_conflicts=True,
+    )
+    processed = OutboxPosition.objects.filter(
+        consumer__in=CONSUMERS).aggregate(last=Min('last_event_id'))['last']
+    return OutboxEvent.objects.filter(id__lte=processed or 0).delete()[0]
+
+
+@receiver(request_finished)
+def process_after_response(sender, **kwargs):
+    """События запроса обрабатываются, когда ответ уже отправлен."""
+    if not (settings.OUTBOX_PROCESS_AFTER_RESPONSE and _appended.get()):
+        return
+    _appended.set(False)
+    try:
+        process_all()
+    except Exception:
+        # Необработанные события останутся в очереди до следующего раза.
+        logger.exception('Outbox processing failed')
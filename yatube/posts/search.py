@@ -0,0 +1,145 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+# Границы совпадения в сниппете: управляющие символы не встречаются
+# в тексте постов и переживают экранирование HTML.
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+SNIPPET_TOKENS = 12
+WORD_RE = re.compile(r'\w+')
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def to_match_query(query):
+    """Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово берётся в кавычки и ищется по префиксу, все слова
+    должны встретиться в тексте.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(query))
+
+
+def index_post(post):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def unindex_post(post_id):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index():
+    """Заново наполняет индекс из таблицы постов."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table}'
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) "
+                       f"VALUES ('optimize')")
+
+
+def filter_posts(queryset, query):
+    """Оставляет в queryset посты, подходящие под поисковый запрос."""
+    match = to_match_query(query)
+    if not match:
+        return queryset.none()
+    if not fts_enabled():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match],
+    ))
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MATCH_START, '<mark>')
+        .replace(MATCH_END, '</mark>')
+    )
+
+
+class SearchResults:
+    """Ленивый список найденных постов, упорядоченный по релевантности.
+
+    Реализует count() и срезы, поэтому страницы строит обычный
+    Paginator: каждая страница — один запрос к индексу и один к постам.
+    """
+
+    def __init__(self, query):
+        self.match = to_match_query(query)
+        self.query = query
+
+    def count(self):
+        if not self.match:
+            return 0
+        if not fts_enabled():
+            return Post.objects.filter(text__icontains=self.query).count()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def _ranked(self, offset, limit):
+        if not fts_enabled():
+            posts = Post.objects.filter(
+                text__icontains=self.query)[offset:offset + limit]
+            return [(post.pk, highlight(post.text)) for post in posts]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [MATCH_START, MATCH_END, '…', SNIPPET_TOKENS,
+                 self.match, limit, offset],
+            )
+            return [
+                (post_id, highlight(snippet))
+                for post_id, snippet in cursor.fetchall()
+            ]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.match:
+            return []
+        offset = index.start or 0
+        ranked = self._ranked(offset, index.stop - offset)
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, _ in ranked])
+        results = []
+        for post_id, snippet in ranked:
+            post = posts.get(post_id)
+            if post is not None:
+                post.snippet = snippet
+                results.append(post)
+        return results
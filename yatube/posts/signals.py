@@ -0,0 +1,240 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from . import feeds, follow_graph, outbox
+from .caching import (
+    author_page_tags,
+    author_tags,
+    comments_tags,
+    group_page_tags,
+    group_tags,
+    index_tags,
+    invalidate_tags_on_commit,
+    post_page_tags,
+    post_tags,
+)
+from .counters import change_comments_count, change_user_stats
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+# Ленты и поисковый индекс обновляют потребители событий, см.
+# posts.consumers; здесь остаются дешёвые изменения, которые должны
+# быть видны сразу.
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, **kwargs):
+    if created:
+        change_user_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_user_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, **kwargs):
+    if created:
+        change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_created_follow(sender, instance, created, **kwargs):
+    if created:
+        change_user_stats(instance.author_id, followers_count=1)
+        change_user_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    change_user_stats(instance.author_id, followers_count=-1)
+    change_user_stats(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def add_follow_edge(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(
+            partial(follow_graph.add, instance.user_id, instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def remove_follow_edge(sender, instance, **kwargs):
+    transaction.on_commit(
+        partial(follow_graph.remove, instance.user_id, instance.author_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_username(sender, instance, **kwargs):
+    follow_graph.forget_username(instance.pk)
+
+
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_names(sender, instance, update_fields=None, **kwargs):
+    instance._previous_names = None
+    # Вход пользователя сохраняет только last_login.
+    if update_fields is not None and not set(update_fields) & set(
+            NAME_FIELDS):
+        return
+    if instance.pk:
+        instance._previous_names = (
+            User.objects.filter(pk=instance.pk)
+            .values_list(*NAME_FIELDS)
+            .first()
+        )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_names', None)
+    current = tuple(getattr(instance, field) for field in NAME_FIELDS)
+    if created or previous is None or previous == current:
+        return
+    invalidate_tags_on_commit(*author_page_tags(instance, previous[0]))
+
+
+@receiver(post_save, sender=Post)
+def record_saved_post(sender, instance, created, **kwargs):
+    outbox.append(
+        'post', instance.pk, 'post.created' if created else 'post.updated',
+        post_id=instance.pk, author_id=instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def record_deleted_post(sender, instance, **kwargs):
+    outbox.append(
+        'post', instance.pk, 'post.deleted',
+        post_id=instance.pk, author_id=instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def record_created_comment(sender, instance, created, **kwargs):
+    if created:
+        outbox.append(
+            'post', instance.post_id, 'comment.created',
+            comment_id=instance.pk, post_id=instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def record_deleted_comment(sender, instance, **kwargs):
+    outbox.append(
+        'post', instance.post_id, 'comment.deleted',
+        comment_id=instance.pk, post_id=instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def record_created_follow(sender, instance, created, **kwargs):
+    if created:
+        outbox.append(
+            'user', instance.user_id, 'follow.created',
+            user_id=instance.user_id, author_id=instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def record_deleted_follow(sender, instance, **kwargs):
+    outbox.append(
+        'user', instance.user_id, 'follow.deleted',
+        user_id=instance.user_id, author_id=instance.author_id,
+        fanout_resumed=feeds.fanout_resumed(instance.author_id))
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance, **kwargs):
+    instance._previous_group_slug = None
+    instance._previous_image = None
+    if instance.pk:
+        previous = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group__slug', 'image')
+            .first()
+        )
+        if previous:
+            instance._previous_group_slug, instance._previous_image = previous
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    invalidate_tags_on_commit(*post_page_tags(
+        instance, getattr(instance, '_previous_group_slug', None)))
+
+
+@receiver(pre_save, sender=Post)
+def reset_thumbnails(sender, instance, **kwargs):
+    if instance.image.name != getattr(instance, '_previous_image', None):
+        instance.thumbnails_ready = False
+        instance.thumbnails = ''
+
+
+@receiver(post_save, sender=Post)
+def request_thumbnails(sender, instance, **kwargs):
+    if instance.image and not instance.thumbnails_ready:
+        outbox.append(
+            'post', instance.pk, 'thumbnails.requested', post_id=instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    # add_comment загружает пост вместе с автором и группой.
+    post = instance.post
+    invalidate_tags_on_commit(*post_tags(post.pk), *comments_tags([
+        *index_tags(),
+        *author_tags(post.author.username),
+        *(group_tags(post.group.slug) if post.group_id else []),
+    ]))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    # Меняются счётчики подписчиков автора и подписок пользователя.
+    usernames = follow_graph.usernames(
+        [instance.author_id, instance.user_id])
+    invalidate_tags_on_commit(
+        *(tag for username in usernames for tag in author_tags(username)))
+
+
+@receiver(pre_save, sender=Group)
+def remember_previous_slug(sender, instance, **kwargs):
+    instance._previous_slug = None
+    if instance.pk:
+        instance._previous_slug = (
+            Group.objects.filter(pk=instance.pk)
+            .values_list('slug', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    invalidate_tags_on_commit(*group_page_tags(
+        instance, getattr(instance, '_previous_slug', None)))
+
+
+# После удаления у постов уже нет группы: теги собираются до него.
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group_pages(sender, instance, **kwargs):
+    invalidate_tags_on_commit(*group_page_tags(instance))
@@ -0,0 +1,302 @@
+"""Генератор синтетических данных в масштабе продакшена.
+
+Записи вставляются через bulk_create пачками по batch_size строк, по
+транзакции на пачку. Сигналы при этом не срабатывают, поэтому генератор сам
+заполняет то, что обычно поддерживают сигналы: счётчики, входящие
+ленты и поисковый индекс. Первичные ключи назначаются явно, чтобы
+связывать записи без повторного чтения из базы.
+
+Активность авторов подчиняется степенному закону: автор с рангом r
+пишет посты и набирает подписчиков с весом 1 / r ** alpha. Число
+комментариев к посту имеет распределение Парето. Результат полностью
+определяется seed; даты публикации — моменты вставки.
+"""
+import itertools
+import os
+import random
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .models import Comment, FeedEntry, Follow, Group, Post, User, UserStats
+from .search import fts_enabled, rebuild_index
+
+WORDS = (
+    'закат рассвет море горы город лес река поезд дорога книга кофе '
+    'музыка кино дождь снег солнце ветер облако улица парк мост окно '
+    'собака кошка друг работа отпуск праздник вечер утро ночь звезда'
+).split()
+VOCABULARY = WORDS + [f'тема{i}' for i in range(5000)]
+VOCABULARY_WEIGHTS = list(itertools.accumulate(
+    1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+IMAGE_POOL_SIZE = 16
+IMAGE_SIZE = (960, 540)
+# Хвост распределения числа комментариев: при 1.5 среднее конечно,
+# а дисперсия нет — у редких постов тысячи комментариев.
+COMMENTS_SHAPE = 1.5
+MAX_COMMENTS_PER_POST = 100000
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def power_law_weights(count, alpha):
+    """Накопленные веса рангов 1..count для random.choices."""
+    return list(itertools.accumulate(
+        1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class SyntheticData:
+    """Наполняет базу пользователями, группами, подписками и постами.
+
+    После generate() в stats лежат строки (название, число записей,
+    секунды) для отчёта о скорости вставки.
+    """
+
+    def __init__(self, users, groups, posts, comments_per_post=2.0,
+                 follows_per_user=20, images=0.0, alpha=1.1, seed=0,
+                 batch_size=10000, feed=True):
+        self.users_count = users
+        self.groups_count = groups
+        self.posts_count = posts
+        self.comments_per_post = comments_per_post
+        self.follows_per_user = follows_per_user
+        self.images = images
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.feed = feed
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.stats = []
+
+    def generate(self):
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            # Синтетическую базу не жалко потерять при сбое питания.
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+        self.timed('users', self.create_users)
+        self.timed('groups', self.create_groups)
+        self.timed('follows', self.create_follows)
+        self.posts_by_author = Counter()
+        self.image_names = self.create_images()
+        self.comments_created = 0
+        self.feed_created = 0
+        self.timed('posts, comments, feed', self.create_posts)
+        self.timed('user stats', self.create_user_stats)
+        self.reset_sequences()
+        if fts_enabled():
+            self.timed('search index', self.build_search_index)
+
+    def timed(self, name, func):
+        """Выполняет шаг генерации; func возвращает число вставленных строк."""
+        start = time.perf_counter()
+        rows = func()
+        self.stats.append((name, rows, time.perf_counter() - start))
+
+    def insert(self, model, objects):
+        with transaction.atomic():
+            model.objects.bulk_create(objects)
+
+    def create_users(self):
+        first_id = next_id(User)
+        self.user_ids = list(range(first_id, first_id + self.users_count))
+        password = make_password(None)
+        for batch in batches(self.user_ids, self.batch_size):
+            self.insert(User, [
+                User(pk=pk, username=f'synthetic_{pk}', password=password)
+                for pk in batch
+            ])
+        return self.users_count
+
+    def create_groups(self):
+        first_id = next_id(Group)
+        self.group_ids = list(range(first_id, first_id + self.groups_count))
+        for batch in batches(self.group_ids, self.batch_size):
+            self.insert(Group, [
+                Group(
+                    pk=pk,
+                    title=f'Группа {pk}',
+                    slug=f'synthetic-{pk}',
+                    description=self.text(20),
+                )
+                for pk in batch
+            ])
+        return self.groups_count
+
+    def create_follows(self):
+        """Создаёт подписки и запоминает подписчиков каждого автора."""
+        weights = power_law_weights(len(self.user_ids), self.alpha)
+        self.followers = defaultdict(list)
+        created = 0
+        pairs = (
+            (user_id, author_id)
+            for user_id in self.user_ids
+            for author_id in self.followed_authors(user_id, weights)
+        )
+        for batch in batches(pairs, self.batch_size):
+            self.insert(Follow, [
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in batch
+            ])
+            for user_id, author_id in batch:
+                self.followers[author_id].append(user_id)
+            created += len(batch)
+        return created
+
+    def followed_authors(self, user_id, weights):
+        count = min(
+            self.rng.randint(0, 2 * self.follows_per_user),
+            len(self.user_ids) - 1,
+        )
+        authors = set()
+        while len(authors) < count:
+            author_id = self.rng.choices(self.user_ids, cum_weights=weights)[0]
+            if author_id != user_id:
+                authors.add(author_id)
+        return sorted(authors)
+
+    def create_images(self):
+        """Небольшой набор картинок, общий для всех постов с картинкой."""
+        if not self.images:
+            return []
+        from PIL import Image
+
+        names = []
+        directory = os.path.join(settings.MEDIA_ROOT, 'posts', 'synthetic')
+        os.makedirs(directory, exist_ok=True)
+        for index in range(IMAGE_POOL_SIZE):
+            name = f'posts/synthetic/{self.seed}_{index}.jpg'
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if not os.path.exists(path):
+                # Отдельный генератор: файл может остаться от прошлого
+                # запуска, и основная последовательность не должна
+                # зависеть от этого.
+                rng = random.Random(f'{self.seed}:{index}')
+                color = tuple(rng.randrange(256) for _ in range(3))
+                Image.new('RGB', IMAGE_SIZE, color).save(path, 'JPEG')
+            names.append(name)
+        return names
+
+    def text(self, words):
+        return ' '.join(self.rng.choices(
+            VOCABULARY, cum_weights=VOCABULARY_WEIGHTS, k=words))
+
+    def comments_count(self):
+        tail = self.rng.paretovariate(COMMENTS_SHAPE) - 1
+        mean_tail = 1 / (COMMENTS_SHAPE - 1)
+        return min(
+            MAX_COMMENTS_PER_POST,
+            int(self.comments_per_post * tail / mean_tail),
+        )
+
+    def new_post(self, pk, author_weights, group_weights):
+        author_id = self.rng.choices(
+            self.user_ids, cum_weights=author_weights)[0]
+        group_id = None
+        if self.group_ids and self.rng.random() < 2 / 3:
+            group_id = self.rng.choices(
+                self.group_ids, cum_weights=group_weights)[0]
+        image = ''
+        if self.image_names and self.rng.random() < self.images:
+            image = self.rng.choice(self.image_names)
+        self.posts_by_author[author_id] += 1
+        return Post(
+            pk=pk,
+            author_id=author_id,
+            group_id=group_id,
+            text=self.text(self.rng.randint(5, 40)),
+            image=image,
+            comments_count=self.comments_count(),
+        )
+
+    def create_posts(self):
+        author_weights = power_law_weights(len(self.user_ids), self.alpha)
+        group_weights = power_law_weights(len(self.group_ids), self.alpha)
+        first_id = next_id(Post)
+        ids = range(first_id, first_id + self.posts_count)
+        for batch in batches(ids, self.batch_size):
+            posts = [
+                self.new_post(pk, author_weights, group_weights)
+                for pk in batch
+            ]
+            with transaction.atomic():
+                Post.objects.bulk_create(posts)
+                self.create_comments(posts)
+                if self.feed:
+                    self.fan_out(posts)
+        return self.posts_count + self.comments_created + self.feed_created
+
+    def create_comments(self, posts):
+        comments = (
+            Comment(
+                post_id=post.pk,
+                author_id=self.rng.choice(self.user_ids),
+                text=self.text(self.rng.randint(3, 20)),
+            )
+            for post in posts
+            for _ in range(post.comments_count)
+        )
+        for batch in batches(comments, self.batch_size):
+            Comment.objects.bulk_create(batch)
+            self.comments_created += len(batch)
+
+    def fan_out(self, posts):
+        """Входящие ленты, как их построил бы сигнал fan_out_post."""
+        entries = (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for post in posts
+            if len(self.followers[post.author_id])
+            <= settings.FEED_FANOUT_LIMIT
+            for user_id in self.followers[post.author_id]
+        )
+        for batch in batches(entries, self.batch_size):
+            FeedEntry.objects.bulk_create(batch)
+            self.feed_created += len(batch)
+
+    def create_user_stats(self):
+        following = Counter()
+        for author_followers in self.followers.values():
+            following.update(author_followers)
+        for batch in batches(self.user_ids, self.batch_size):
+            self.insert(UserStats, [
+                UserStats(
+                    user_id=user_id,
+                    posts_count=self.posts_by_author[user_id],
+                    followers_count=len(self.followers[user_id]),
+                    following_count=following[user_id],
+                )
+                for user_id in batch
+            ])
+        return self.users_count
+
+    def reset_sequences(self):
+        """Сдвигает автоинкремент за явно назначенные ключи."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Group, Post])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def build_search_index(self):
+        rebuild_index()
+        return Post.objects.count()
@@ -0,0 +1,15 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.holes import marker, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    """Персональный фрагмент; на общей кэшируемой странице — метка."""
+    request = context.get('request')
+    if getattr(request, 'punching_holes', False):
+        return marker(name, *args)
+    return mark_safe(render_hole(request, name, *args))
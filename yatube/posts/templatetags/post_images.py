@@ -0,0 +1,11 @@
+from django import template
+
+from posts.thumbnails import ready_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, preset):
+    """Готовая миниатюра картинки поста или None, пока она строится."""
+    return ready_thumbnail(post, preset)
@@ -1,6 +1,7 @@
 EXAMPLE_SLUG = 'test-slug'
 EXAMPLE_USERNAME = 'auth'
 EXAMPLE_USERNAME_1 = 'auth1'
+EXAMPLE_USERNAME_2 = 'auth2'
 EXAMPLE_TEXT = 'Тестовый пост'
 EXAMPLE_TEXT_1 = 'Тестовый пост 1'
 EXAMPLE_TITLE = 'Тестовый заголовок'
@@ -13,9 +14,18 @@ POST_DETAIL_URL = 'posts:post_detail'
 POST_EDIT_URL = 'posts:post_edit'
 POST_CREATE_URL = 'posts:post_create'
 ADD_COMMENT_URL = 'posts:add_comment'
+POST_COMMENTS_URL = 'posts:post_comments'
 FOLLOW_INDEX_URL = 'posts:follow_index'
 PROFILE_FOLLOW = 'posts:profile_follow'
 PROFILE_UNFOLLOW = 'posts:profile_unfollow'
+SEARCH_URL = 'posts:search'
+API_POSTS_URL = 'posts:api_posts'
+API_POST_URL = 'posts:api_post'
+API_POST_COMMENTS_URL = 'posts:api_post_comments'
+API_GROUP_URL = 'posts:api_group'
+API_GROUP_POSTS_URL = 'posts:api_group_posts'
+API_PROFILE_URL = 'posts:api_profile'
+API_PROFILE_POSTS_URL = 'posts:api_profile_posts'
 
 INDEX_TEMPLATE = 'posts/index.html'
 GROUP_LIST_TEMPLATE = 'posts/group_list.html'
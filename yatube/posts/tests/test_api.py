@@ -0,0 +1,148 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.testing import QueryBudgetMixin
+from posts.models import Comment, Group, Post, User
+from posts.tests.constants import (
+    API_GROUP_POSTS_URL,
+    API_GROUP_URL,
+    API_POST_COMMENTS_URL,
+    API_POST_URL,
+    API_POSTS_URL,
+    API_PROFILE_POSTS_URL,
+    API_PROFILE_URL,
+    EXAMPLE_DESCRIPTION,
+    EXAMPLE_SLUG,
+    EXAMPLE_TEXT,
+    EXAMPLE_TITLE,
+    EXAMPLE_USERNAME,
+)
+
+POSTS_COUNT = 25
+
+
+class ApiTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=EXAMPLE_USERNAME)
+        cls.group = Group.objects.create(
+            title=EXAMPLE_TITLE,
+            slug=EXAMPLE_SLUG,
+            description=EXAMPLE_DESCRIPTION,
+        )
+        for index in range(POSTS_COUNT):
+            Post.objects.create(
+                author=cls.user,
+                group=cls.group if index % 2 else None,
+                text=f'{EXAMPLE_TEXT} {index}',
+            )
+        cls.post = Post.objects.order_by('id').first()
+        for index in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'{EXAMPLE_TEXT} {index}')
+
+    def setUp(self):
+        cache.clear()
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        return response, json.loads(content)
+
+    def test_posts_pages(self):
+        url = reverse(API_POSTS_URL)
+        response, first = self.get_json(url, limit=10)
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(first['results']), 10)
+        self.assertEqual(
+            first['results'][0]['text'], f'{EXAMPLE_TEXT} {POSTS_COUNT - 1}')
+        self.assertIsNone(first['previous'])
+        texts = [post['text'] for post in first['results']]
+        cursor = first['next']
+        while cursor:
+            _, page = self.get_json(url, limit=10, cursor=cursor)
+            texts += [post['text'] for post in page['results']]
+            cursor = page['next']
+        self.assertEqual(len(set(texts)), POSTS_COUNT)
+
+    def test_fields(self):
+        url = reverse(API_POSTS_URL)
+        response, page = self.get_json(url, fields='id,text')
+        self.assertEqual(set(page['results'][0]), {'id', 'text'})
+        self.assertNotIn('auth_user', str(response.sql_stats.shapes))
+        _, page = self.get_json(url, fields='author,group', limit=2)
+        self.assertEqual(
+            page['results'],
+            [{'author': EXAMPLE_USERNAME, 'group': None},
+             {'author': EXAMPLE_USERNAME, 'group': EXAMPLE_SLUG}],
+        )
+        response = self.client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {'limit': 1000})
+        self.assertEqual(response.status_code, 400)
+
+    def test_lists(self):
+        cases = (
+            (reverse(API_GROUP_POSTS_URL, args=[EXAMPLE_SLUG]), 12),
+            (reverse(API_PROFILE_POSTS_URL, args=[EXAMPLE_USERNAME]), 20),
+            (reverse(API_POST_COMMENTS_URL, args=[self.post.id]), 3),
+        )
+        for url, count in cases:
+            with self.subTest(url=url):
+                _, page = self.get_json(url)
+                self.assertEqual(len(page['results']), count)
+
+    def test_objects(self):
+        _, post = self.get_json(reverse(API_POST_URL, args=[self.post.id]))
+        self.assertEqual(post['text'], self.post.text)
+        self.assertEqual(post['comments_count'], 3)
+        _, group = self.get_json(reverse(API_GROUP_URL, args=[EXAMPLE_SLUG]))
+        self.assertEqual(group['title'], EXAMPLE_TITLE)
+        _, profile = self.get_json(
+            reverse(API_PROFILE_URL, args=[EXAMPLE_USERNAME]))
+        self.assertEqual(profile['posts_count'], POSTS_COUNT)
+        response = self.client.get(reverse(API_POST_URL, args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'not found'})
+
+    def test_not_modified(self):
+        url = reverse(API_POSTS_URL)
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.user, text=EXAMPLE_TEXT)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_changes_list_etag(self):
+        """Новый комментарий меняет ETag списков с comments_count."""
+        post = Post.objects.filter(group=self.group).first()
+        urls = [
+            reverse(API_POSTS_URL),
+            reverse(API_GROUP_POSTS_URL, args=[self.group.slug]),
+            reverse(API_PROFILE_POSTS_URL, args=[self.user.username]),
+        ]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        without_count = {'fields': 'id,text'}
+        etag = self.client.get(urls[0], without_count)['ETag']
+        Comment.objects.create(post=post, author=self.user, text=EXAMPLE_TEXT)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            urls[0], without_count, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_read_only(self):
+        response = self.client.post(reverse(API_POSTS_URL))
+        self.assertEqual(response.status_code, 405)
@@ -1,17 +1,35 @@
+import gzip
+
 from django.core.cache import cache
-from django.test import TestCase, Client
+from django.core.cache.utils import make_template_fragment_key
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 
-from posts.models import Post, User
+from core.testing import CommitCallbacksMixin
+from posts import outbox
+from posts.models import Comment, Follow, Group, Post, User
 
 from posts.tests.constants import (
+    EXAMPLE_SLUG,
     EXAMPLE_USERNAME,
+    EXAMPLE_USERNAME_1,
     EXAMPLE_TEXT,
-    INDEX_URL
+    EXAMPLE_TEXT_1,
+    FOLLOW_INDEX_URL,
+    GROUP_LIST_URL,
+    INDEX_TEMPLATE,
+    INDEX_URL,
+    POST_DETAIL_TEMPLATE,
+    POST_DETAIL_URL,
+    POST_EDIT_URL,
+    PROFILE_FOLLOW,
+    PROFILE_TEMPLATE,
+    PROFILE_UNFOLLOW,
+    PROFILE_URL,
 )
 
 
-class CacheTests(TestCase):
+class CacheTests(CommitCallbacksMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -23,6 +41,7 @@ class CacheTests(TestCase):
 
     def setUp(self):
         self.client = Client()
+        cache.clear()
 
     def test_cache_save(self):
         """Кэш коррекно сохраняет данные."""
@@ -32,7 +51,7 @@ class CacheTests(TestCase):
         self.assertIsNone(cache.get(self.cache_key))
 
     def test_cache_update(self):
-        """Кэш обновляется каждые 20 секунд."""
+        """После очистки кэша страница строится заново."""
         self.assertIsNone(cache.delete(self.cache_key))
         response = self.client.get(reverse(INDEX_URL))
         self.assertContains(response, self.post.text)
@@ -40,3 +59,287 @@ class CacheTests(TestCase):
         response2 = self.client.get(reverse(INDEX_URL))
         self.assertContains(response2, self.post.text)
         self.assertEqual(response.content, response2.content)
+
+    def test_cache_invalidated_by_post(self):
+        """Новый пост сбрасывает закэшированную главную страницу."""
+        response = self.client.get(reverse(INDEX_URL))
+        self.assertNotContains(response, EXAMPLE_TEXT_1)
+        Post.objects.create(author=self.user, text=EXAMPLE_TEXT_1)
+        response = self.client.get(reverse(INDEX_URL))
+        self.assertContains(response, EXAMPLE_TEXT_1)
+
+    def test_cache_invalidated_after_commit(self):
+        """Страница, собранная до фиксации записи, сбрасывается после неё."""
+        Post.objects.create(author=self.user, text=EXAMPLE_TEXT_1)
+        self.client.get(reverse(INDEX_URL))
+        response = self.client.get(reverse(INDEX_URL))
+        self.assertTemplateNotUsed(response, INDEX_TEMPLATE)
+        self.runCommitCallbacks()
+        response = self.client.get(reverse(INDEX_URL))
+        self.assertTemplateUsed(response, INDEX_TEMPLATE)
+
+    def test_cache_invalidated_by_comment(self):
+        """Новый комментарий сбрасывает кэш страницы поста."""
+        url = reverse(POST_DETAIL_URL, kwargs={'post_id': self.post.id})
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertTemplateNotUsed(response, POST_DETAIL_TEMPLATE)
+        Comment.objects.create(
+            post=self.post, author=self.user, text=EXAMPLE_TEXT_1)
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, POST_DETAIL_TEMPLATE)
+
+    def test_post_card_fragment(self):
+        """Карточка поста кэшируется и обновляется после правки поста."""
+        self.client.get(reverse(INDEX_URL))
+        key = make_template_fragment_key('post_card', [
+            self.post.id,
+            self.post.edited,
+            '',
+            self.user.username,
+            self.user.get_full_name(),
+            False,
+        ])
+        self.assertIn(self.post.text, cache.get(key))
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = EXAMPLE_TEXT_1
+        post.save()
+        response = self.client.get(reverse(INDEX_URL))
+        self.assertContains(response, EXAMPLE_TEXT_1)
+
+    @override_settings(POST_CARD_CACHE_TIMEOUT=0)
+    def test_post_card_timeout(self):
+        """Срок жизни карточки задаётся настройкой."""
+        self.client.get(reverse(INDEX_URL))
+        key = make_template_fragment_key('post_card', [
+            self.post.id,
+            self.post.edited,
+            '',
+            self.user.username,
+            self.user.get_full_name(),
+            False,
+        ])
+        self.assertIsNone(cache.get(key))
+
+
+class HolePunchingTests(TestCase):
+    """Общая страница из кэша с персональными частями."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=EXAMPLE_USERNAME)
+        cls.reader = User.objects.create(username=EXAMPLE_USERNAME_1)
+        cls.post = Post.objects.create(author=cls.author, text=EXAMPLE_TEXT)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_header_is_personal(self):
+        url = reverse(INDEX_URL)
+        self.client.get(url)
+        response = self.reader_client.get(url)
+        self.assertTemplateNotUsed(response, INDEX_TEMPLATE)
+        self.assertContains(response, f'Пользователь: {self.reader}')
+        self.assertContains(response, 'Избранные авторы')
+        self.assertIn('private', response['Cache-Control'])
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Пользователь:')
+        self.assertNotContains(response, 'Избранные авторы')
+        self.assertContains(response, 'Войти')
+
+    def test_follow_button(self):
+        url = reverse(PROFILE_URL, args=[self.author.username])
+        self.reader_client.get(url)
+        response = self.author_client.get(url)
+        self.assertTemplateNotUsed(response, PROFILE_TEMPLATE)
+        self.assertNotContains(response, 'Подписаться')
+        self.assertNotContains(response, 'Отписаться')
+        response = self.reader_client.get(url)
+        self.assertContains(response, reverse(
+            PROFILE_UNFOLLOW, args=[self.author.username]))
+        response = self.client.get(url)
+        self.assertNotContains(response, reverse(
+            PROFILE_FOLLOW, args=[self.author.username]))
+
+    def test_comment_form_and_edit_link(self):
+        url = reverse(POST_DETAIL_URL, args=[self.post.id])
+        edit_url = reverse(POST_EDIT_URL, args=[self.post.id])
+        response = self.client.get(url)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        response = self.reader_client.get(url)
+        self.assertTemplateNotUsed(response, POST_DETAIL_TEMPLATE)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, edit_url)
+        response = self.author_client.get(url)
+        self.assertContains(response, edit_url)
+
+
+class ConditionalGetTests(CommitCallbacksMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username=EXAMPLE_USERNAME)
+        cls.reader = User.objects.create(username=EXAMPLE_USERNAME_1)
+        cls.post = Post.objects.create(author=cls.author, text=EXAMPLE_TEXT)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        outbox.process_all()
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def assertNotModified(self, client, url, etag):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_index(self):
+        url = reverse(INDEX_URL)
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertNotModified(self.client, url, etag)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        Post.objects.create(author=self.author, text=EXAMPLE_TEXT_1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, EXAMPLE_TEXT_1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_index_follow(self):
+        """Подписка меняет ETag страниц с кнопками подписки."""
+        Post.objects.create(author=self.reader, text=EXAMPLE_TEXT_1)
+        url = reverse(INDEX_URL)
+        author_client = Client()
+        author_client.force_login(self.author)
+        etag = author_client.get(url)['ETag']
+        self.assertNotModified(author_client, url, etag)
+        author_client.get(
+            reverse(PROFILE_FOLLOW, args=[self.reader.username]))
+        self.runCommitCallbacks()
+        response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_detail_comment(self):
+        url = reverse(POST_DETAIL_URL, args=[self.post.id])
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(self.client, url, etag)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text=EXAMPLE_TEXT_1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, EXAMPLE_TEXT_1)
+
+    def test_post_detail_author_stats(self):
+        """Новый пост автора меняет счётчик на страницах его постов."""
+        url = reverse(POST_DETAIL_URL, args=[self.post.id])
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.author, text=EXAMPLE_TEXT_1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_follow_counts(self):
+        """Подписка меняет страницу профиля подписчика."""
+        url = reverse(PROFILE_URL, args=[self.reader.username])
+        etag = self.client.get(url)['ETag']
+        Follow.objects.filter(user=self.reader).delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_author_rename(self):
+        """Новое имя автора видно на лентах и в профиле."""
+        group = Group.objects.create(
+            title=EXAMPLE_TEXT, slug=EXAMPLE_SLUG, description=EXAMPLE_TEXT)
+        Post.objects.create(
+            author=self.author, text=EXAMPLE_TEXT_1, group=group)
+        urls = [
+            reverse(INDEX_URL),
+            reverse(GROUP_LIST_URL, args=[group.slug]),
+            reverse(PROFILE_URL, args=[self.author.username]),
+        ]
+        for url in urls:
+            self.client.get(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Переименованный')
+
+    def test_group_rename(self):
+        """Смена слага группы обновляет страницы её постов и авторов."""
+        group = Group.objects.create(
+            title=EXAMPLE_TEXT, slug=EXAMPLE_SLUG, description=EXAMPLE_TEXT)
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        urls = [
+            reverse(POST_DETAIL_URL, args=[self.post.id]),
+            reverse(PROFILE_URL, args=[self.author.username]),
+        ]
+        for url in urls:
+            self.client.get(url)
+        group.slug = f'{EXAMPLE_SLUG}-new'
+        group.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), group.slug)
+
+    def test_follow_index(self):
+        url = reverse(FOLLOW_INDEX_URL)
+        etag = self.reader_client.get(url)['ETag']
+        self.assertNotModified(self.reader_client, url, etag)
+        post = Post.objects.create(author=self.author, text=EXAMPLE_TEXT_1)
+        outbox.process_all()
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, EXAMPLE_TEXT_1)
+        etag = response['ETag']
+        post.text = EXAMPLE_TEXT
+        post.save()
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        Follow.objects.filter(user=self.reader).delete()
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class CompressedPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=EXAMPLE_USERNAME)
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'{EXAMPLE_TEXT} {index}')
+            for index in range(10))
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_gzip_hit(self):
+        url = reverse(INDEX_URL)
+        identity = self.client.get(url)
+        self.assertNotIn('Content-Encoding', identity)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertTemplateNotUsed(response, INDEX_TEMPLATE)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertLess(len(response.content), len(identity.content))
+        self.assertEqual(
+            gzip.decompress(response.content), identity.content)
+
+    def test_gzip_holes(self):
+        url = reverse(INDEX_URL)
+        self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        response = self.authorized_client.get(
+            url, HTTP_ACCEPT_ENCODING='gzip')
+        content = gzip.decompress(response.content).decode()
+        self.assertIn(f'Пользователь: {self.user.username}', content)
+        self.assertIn(f'{EXAMPLE_TEXT} 9', content)
@@ -0,0 +1,58 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Post, User, UserStats
+from posts.tests.constants import (
+    EXAMPLE_TEXT,
+    EXAMPLE_USERNAME,
+    EXAMPLE_USERNAME_1,
+)
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username=EXAMPLE_USERNAME)
+        self.author = User.objects.create_user(username=EXAMPLE_USERNAME_1)
+        self.post = Post.objects.create(author=self.author, text=EXAMPLE_TEXT)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text=EXAMPLE_TEXT)
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).following_count, 1)
+        comment.delete()
+        follow.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0)
+
+    def test_post_edit_keeps_comments_count(self):
+        """Правка поста не затирает счётчик комментариев."""
+        stale_post = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(
+            post=self.post, author=self.user, text=EXAMPLE_TEXT)
+        stale_post.text = 'Новый текст'
+        stale_post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_reconcile_counters(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=3)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
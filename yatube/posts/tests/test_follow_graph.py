@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import CommitCallbacksMixin
+from posts import follow_graph
+from posts.caching import follow_tags
+from posts.models import Follow, Post, User
+from posts.tests.constants import (
+    EXAMPLE_TEXT,
+    EXAMPLE_USERNAME,
+    EXAMPLE_USERNAME_1,
+    EXAMPLE_USERNAME_2,
+    INDEX_URL,
+    PROFILE_FOLLOW,
+    PROFILE_UNFOLLOW,
+)
+
+
+class FollowGraphTest(CommitCallbacksMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=EXAMPLE_USERNAME)
+        self.author = User.objects.create_user(username=EXAMPLE_USERNAME_1)
+        self.other = User.objects.create_user(username=EXAMPLE_USERNAME_2)
+        Follow.objects.create(user=self.user, author=self.other)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_lookups_without_sql(self):
+        """После первого чтения подписки проверяются без SQL."""
+        follow_graph.following(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.is_following(self.user.pk, self.other.pk))
+            self.assertFalse(
+                follow_graph.is_following(self.user.pk, self.author.pk))
+
+    def test_follow_updates_graph(self):
+        """Подписка и отписка меняют закэшированный массив после фиксации."""
+        follow_graph.following(self.user.pk)
+        self.client.post(reverse(PROFILE_FOLLOW, args=[self.author.username]))
+        self.assertEqual(
+            list(follow_graph.following(self.user.pk)), [self.other.pk])
+        self.runCommitCallbacks()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                list(follow_graph.following(self.user.pk)),
+                sorted([self.author.pk, self.other.pk]),
+            )
+        self.client.post(
+            reverse(PROFILE_UNFOLLOW, args=[self.other.username]))
+        self.runCommitCallbacks()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                list(follow_graph.following(self.user.pk)), [self.author.pk])
+
+    def test_follow_tags(self):
+        """Теги ленты подписок строятся по графу и кэшу имён."""
+        request = type('Request', (), {'user': self.user})
+        self.assertEqual(
+            follow_tags(request), [f'author:{EXAMPLE_USERNAME_2}'])
+        with self.assertNumQueries(0):
+            follow_tags(request)
+
+    def test_card_follow_buttons(self):
+        """Кнопки на карточках ленты стоят один запрос подписок на страницу."""
+        authors = [
+            User.objects.create_user(username=f'{EXAMPLE_USERNAME}-{index}')
+            for index in range(5)
+        ]
+        for author in [*authors, self.other]:
+            Post.objects.create(author=author, text=EXAMPLE_TEXT)
+        response = self.client.get(reverse(INDEX_URL))
+        follow_queries = [
+            sql for sql in response.sql_stats.shapes if 'posts_follow' in sql]
+        self.assertEqual(follow_queries, [follow_queries[0]])
+        self.assertEqual(response.sql_stats.shapes[follow_queries[0]], 1)
+        content = response.content.decode()
+        self.assertIn(
+            reverse(PROFILE_UNFOLLOW, args=[self.other.username]), content)
+        for author in authors:
+            self.assertIn(
+                reverse(PROFILE_FOLLOW, args=[author.username]), content)
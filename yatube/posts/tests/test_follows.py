@@ -1,9 +1,11 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 
 from django.contrib.auth.models import User
 
-from posts.models import Post, Follow
+from core.testing import CommitCallbacksMixin
+from posts import outbox
+from posts.models import Post, Follow, FeedEntry
 from django.core.cache import cache
 
 from posts.tests.constants import (
@@ -17,7 +19,7 @@ from posts.tests.constants import (
 )
 
 
-class FollowTest(TestCase):
+class FollowTest(CommitCallbacksMixin, TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username=EXAMPLE_USERNAME)
         self.user1 = User.objects.create_user(username=EXAMPLE_USERNAME_1)
@@ -54,6 +56,7 @@ class FollowTest(TestCase):
         """В ленте отображаются посты тех пользователей,
         на которых подписан текущий пользователь"""
         Follow.objects.create(user=self.user, author=self.user1)
+        outbox.process_all()
         response = self.authorized_client.get(
             reverse(FOLLOW_INDEX_URL), follow=True)
         self.assertEqual(response.status_code, 200)
@@ -69,7 +72,77 @@ class FollowTest(TestCase):
         self.assertNotContains(response, self.post.text)
         self.assertNotContains(response, self.post1.text)
         Follow.objects.create(user=self.user, author=self.user1)
+        outbox.process_all()
         response = self.authorized_client.get(
             reverse(FOLLOW_INDEX_URL), follow=True)
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, self.post1.text)
+
+    def test_feed_fan_out(self):
+        """Новый пост автора попадает во входящую ленту подписчика,
+        а после отписки посты автора из неё удаляются."""
+        Follow.objects.create(user=self.user, author=self.user1)
+        post = Post.objects.create(text=EXAMPLE_TEXT_1, author=self.user1)
+        outbox.process_all()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post=post).exists())
+        self.authorized_client.post(reverse(
+            PROFILE_UNFOLLOW, args=[self.user1.username]))
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_feed_pull_for_popular_author(self):
+        """Посты авторов без рассылки подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.user, author=self.user1)
+        post = Post.objects.create(text='Новый пост', author=self.user1)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+        response = self.authorized_client.get(reverse(FOLLOW_INDEX_URL))
+        self.assertIn(post, response.context['page_obj'])
+        self.assertIn(self.post1, response.context['page_obj'])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_feed_backfilled_when_fanout_resumes(self):
+        """После отписки, вернувшей автора к рассылке, его посты времён
+        подмешивания попадают во входящие ленты подписчиков."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user1)
+        Follow.objects.create(user=self.user, author=self.user1)
+        post = Post.objects.create(text='Новый пост', author=self.user1)
+        outbox.process_all()
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.authorized_client.get(reverse(
+            PROFILE_UNFOLLOW, args=[self.user1.username]))
+        outbox.process_all()
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=reader).values_list(
+                'post_id', flat=True).order_by('post_id')),
+            [self.post1.pk, post.pk],
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_feed_pulls_author_after_fanout_stops(self):
+        """Закэшированные подписки узнают, что автор перестал
+        рассылать посты."""
+        Follow.objects.create(user=self.user, author=self.user1)
+        outbox.process_all()
+        self.runCommitCallbacks()
+        self.authorized_client.get(reverse(FOLLOW_INDEX_URL))
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user1)
+        outbox.process_all()
+        self.runCommitCallbacks()
+        post = Post.objects.create(text='Новый пост', author=self.user1)
+        outbox.process_all()
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.authorized_client.get(reverse(FOLLOW_INDEX_URL))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_feed_numbered_pages_newest_first(self):
+        """Нумерованные страницы ленты идут от новых постов к старым."""
+        Follow.objects.create(user=self.user, author=self.user1)
+        post = Post.objects.create(text='Новый пост', author=self.user1)
+        outbox.process_all()
+        response = self.authorized_client.get(
+            reverse(FOLLOW_INDEX_URL), {'page': 1})
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.post1])
@@ -1,11 +1,13 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.models import Group, Post, User, Comment
 from posts.tests.constants import (
@@ -21,6 +23,12 @@ from posts.tests.constants import (
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+def make_image(name, size, image_format):
+    content = BytesIO()
+    Image.new('RGB', size, 'red').save(content, image_format)
+    return SimpleUploadedFile(name, content.getvalue())
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostCreateFormTests(TestCase):
     @classmethod
@@ -105,3 +113,58 @@ class PostCreateFormTests(TestCase):
         self.assertRedirects(response, reverse(
             POST_DETAIL_URL, args=[self.post.id]))
         self.assertEqual(Comment.objects.count(), comment_count + 1)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    IMAGE_INGEST_MAX_SIZE=100,
+    IMAGE_MAX_PIXELS=400 * 400,
+    IMAGE_DECODE_PIXELS_LIMIT=300 * 300,
+)
+class ImageIngestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username=EXAMPLE_USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': EXAMPLE_TEXT, 'image': image},
+        )
+
+    def test_large_jpeg_downscaled(self):
+        """Огромный JPEG уменьшается при загрузке."""
+        self.create_post(make_image('big.jpg', (360, 240), 'JPEG'))
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (100, 67))
+
+    def test_small_image_kept(self):
+        self.create_post(make_image('small.png', (80, 60), 'PNG'))
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (80, 60))
+
+    def test_oversize_rejected(self):
+        """Размеры сверх лимитов отклоняются с ошибкой формы."""
+        images = (
+            make_image('huge.jpg', (500, 400), 'JPEG'),
+            make_image('wide.png', (350, 350), 'PNG'),
+        )
+        for image in images:
+            with self.subTest(image=image.name):
+                response = self.create_post(image)
+                self.assertFormError(
+                    response, 'form', 'image',
+                    'Изображение {}×{} слишком большое.'.format(
+                        *Image.open(image).size),
+                )
+        self.assertFalse(Post.objects.exists())
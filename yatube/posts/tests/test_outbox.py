@@ -0,0 +1,136 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import outbox
+from posts.models import (
+    Comment,
+    FeedEntry,
+    Follow,
+    OutboxEvent,
+    OutboxFailure,
+    OutboxPosition,
+    Post,
+    User,
+)
+from posts.tests.constants import (
+    EXAMPLE_TEXT,
+    EXAMPLE_USERNAME,
+    EXAMPLE_USERNAME_1,
+    PROFILE_FOLLOW,
+    PROFILE_UNFOLLOW,
+)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=EXAMPLE_USERNAME)
+        self.author = User.objects.create_user(username=EXAMPLE_USERNAME_1)
+        self.post = Post.objects.create(author=self.author, text=EXAMPLE_TEXT)
+        outbox.process_all()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def kinds(self, aggregate, aggregate_id):
+        return list(
+            OutboxEvent.objects.filter(
+                aggregate=aggregate, aggregate_id=aggregate_id,
+            ).order_by('id').values_list('kind', flat=True)
+        )
+
+    def test_events_in_order(self):
+        """Изменения агрегата попадают в поток в порядке записи."""
+        Comment.objects.create(
+            post=self.post, author=self.user, text=EXAMPLE_TEXT)
+        self.post.text = EXAMPLE_TEXT * 2
+        self.post.save()
+        self.assertEqual(
+            self.kinds('post', self.post.pk),
+            ['post.created', 'comment.created', 'post.updated'])
+
+    def test_processed_after_response(self):
+        """Ответ на подписку уходит раньше, чем заполняется лента."""
+        response = self.client.post(
+            reverse(PROFILE_FOLLOW, args=[self.author.username]))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=self.post).exists())
+        last_id = OutboxEvent.objects.latest('id').id
+        self.assertEqual(
+            set(OutboxPosition.objects.values_list(
+                'last_event_id', flat=True)),
+            {last_id},
+        )
+        self.client.post(
+            reverse(PROFILE_UNFOLLOW, args=[self.author.username]))
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            self.kinds('user', self.user.pk),
+            ['follow.created', 'follow.deleted'])
+
+    def test_idempotent(self):
+        """Повторная обработка всей истории не меняет результат."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(author=self.author, text=EXAMPLE_TEXT)
+        self.assertEqual(outbox.process_all(), 2 * len(outbox.CONSUMERS))
+        self.assertEqual(outbox.process_all(), 0)
+        OutboxPosition.objects.update(last_event_id=0)
+        outbox.process_all(batch_size=1)
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 2)
+
+    def test_rolled_back_write_has_no_event(self):
+        count = OutboxEvent.objects.count()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Follow.objects.create(user=self.user, author=self.author)
+                raise RuntimeError
+        self.assertEqual(OutboxEvent.objects.count(), count)
+
+    def test_prune(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(outbox.prune(), 1)
+        outbox.process_all()
+        self.assertEqual(outbox.prune(), 1)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_command_prunes_events_processed_elsewhere(self):
+        """Команда удаляет события, обработанные после ответа сервером."""
+        Follow.objects.create(user=self.user, author=self.author)
+        outbox.process_all()
+        out = StringIO()
+        call_command('process_outbox', stdout=out)
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertIn('Удалено событий', out.getvalue())
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failing_handler(self):
+        """Упавший обработчик повторяется, потом событие пропускается;
+        остальные потребители обрабатывают свои события."""
+        def fail(payload):
+            raise ValueError(payload['author_id'])
+
+        consumers = {'failing': {'follow.created': fail}, **outbox.CONSUMERS}
+        with mock.patch.object(outbox, 'CONSUMERS', consumers), \
+                self.assertLogs('posts.outbox', 'ERROR'):
+            Follow.objects.create(user=self.user, author=self.author)
+            outbox.process_all()
+            self.assertTrue(FeedEntry.objects.filter(user=self.user).exists())
+            failure = OutboxFailure.objects.get(consumer='failing')
+            self.assertEqual(failure.attempts, 1)
+            self.assertEqual(failure.kind, 'follow.created')
+            position = OutboxPosition.objects.get(consumer='failing')
+            self.assertLess(position.last_event_id, failure.event_id)
+            outbox.process_all()
+            failure.refresh_from_db()
+            self.assertEqual(failure.attempts, 2)
+            position.refresh_from_db()
+            self.assertEqual(
+                position.last_event_id,
+                OutboxEvent.objects.latest('id').id,
+            )
@@ -0,0 +1,102 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import QueryBudgetMixin
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.constants import (
+    ADD_COMMENT_URL,
+    EXAMPLE_DESCRIPTION,
+    EXAMPLE_SLUG,
+    EXAMPLE_TEXT,
+    EXAMPLE_TITLE,
+    EXAMPLE_USERNAME,
+    EXAMPLE_USERNAME_1,
+    FOLLOW_INDEX_URL,
+    GROUP_LIST_URL,
+    INDEX_URL,
+    POST_COMMENTS_URL,
+    POST_CREATE_URL,
+    POST_DETAIL_URL,
+    POST_EDIT_URL,
+    PROFILE_FOLLOW,
+    PROFILE_UNFOLLOW,
+    PROFILE_URL,
+    SEARCH_URL,
+)
+
+AUTHORS_COUNT = 15
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Ни один view приложения posts не выходит за SQL-бюджет.
+
+    Страниц и комментариев больше, чем помещается на страницу, а посты
+    написаны разными авторами в разных группах, поэтому N+1 в любом
+    списке проявится повторяющимися запросами.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=EXAMPLE_USERNAME)
+        cls.author = User.objects.create_user(username=EXAMPLE_USERNAME_1)
+        cls.group = Group.objects.create(
+            title=EXAMPLE_TITLE,
+            slug=EXAMPLE_SLUG,
+            description=EXAMPLE_DESCRIPTION,
+        )
+        for i in range(AUTHORS_COUNT):
+            author = User.objects.create_user(username=f'author{i}')
+            group = Group.objects.create(title=f'group{i}', slug=f'group{i}')
+            Follow.objects.create(user=cls.user, author=author)
+            Post.objects.create(author=author, group=group, text=EXAMPLE_TEXT)
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=EXAMPLE_TEXT)
+        cls.post = Post.objects.filter(author=cls.author).first()
+        for author in User.objects.filter(username__startswith='author'):
+            Comment.objects.create(
+                post=cls.post, author=author, text=EXAMPLE_TEXT)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+        self.follower_client = Client()
+        self.follower_client.force_login(self.user)
+        cache.clear()
+
+    def test_read_views(self):
+        urls = (
+            reverse(INDEX_URL),
+            reverse(GROUP_LIST_URL, kwargs={'slug': EXAMPLE_SLUG}),
+            reverse(PROFILE_URL, kwargs={'username': EXAMPLE_USERNAME_1}),
+            reverse(POST_DETAIL_URL, kwargs={'post_id': self.post.id}),
+            reverse(POST_COMMENTS_URL, kwargs={'post_id': self.post.id}),
+            reverse(FOLLOW_INDEX_URL),
+            reverse(SEARCH_URL) + '?q=пост',
+            reverse(POST_CREATE_URL),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertWithinQueryBudget(self.follower_client.get(url))
+
+    def test_write_views(self):
+        requests = (
+            (self.authorized_client, POST_CREATE_URL, {},
+             {'text': EXAMPLE_TEXT, 'group': self.group.id}),
+            (self.authorized_client, POST_EDIT_URL,
+             {'post_id': self.post.id},
+             {'text': EXAMPLE_TEXT, 'group': self.group.id}),
+            (self.follower_client, ADD_COMMENT_URL,
+             {'post_id': self.post.id}, {'text': EXAMPLE_TEXT}),
+            (self.follower_client, PROFILE_FOLLOW,
+             {'username': EXAMPLE_USERNAME_1}, {}),
+            (self.follower_client, PROFILE_UNFOLLOW,
+             {'username': EXAMPLE_USERNAME_1}, {}),
+        )
+        for client, name, kwargs, data in requests:
+            with self.subTest(view=name):
+                response = client.post(reverse(name, kwargs=kwargs), data)
+                self.assertEqual(response.status_code, 302)
+                self.assertWithinQueryBudget(response)
@@ -0,0 +1,129 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.counters import reconcile_user_stats
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.constants import (
+    EXAMPLE_DESCRIPTION,
+    EXAMPLE_SLUG,
+    EXAMPLE_TEXT,
+    EXAMPLE_TITLE,
+    EXAMPLE_USERNAME,
+    FOLLOW_INDEX_URL,
+    GROUP_LIST_URL,
+    INDEX_URL,
+    POST_DETAIL_URL,
+    PROFILE_URL,
+)
+
+AUTHORS_COUNT = 500
+FOLLOWS_PER_AUTHOR = 10
+GROUPS_COUNT = 50
+POSTS_COUNT = 10000
+COMMENTS_COUNT = 3000
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTests(TestCase):
+    """Основные запросы страниц используют индексы.
+
+    На заполненной базе каждый SELECT страницы проверяется через
+    EXPLAIN QUERY PLAN: полный просмотр таблицы или сортировка во
+    временном B-дереве означают, что запросу не хватает индекса.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=EXAMPLE_USERNAME)
+        cls.group = Group.objects.create(
+            title=EXAMPLE_TITLE,
+            slug=EXAMPLE_SLUG,
+            description=EXAMPLE_DESCRIPTION,
+        )
+        Group.objects.bulk_create(
+            Group(title=f'group{i}', slug=f'group{i}')
+            for i in range(GROUPS_COUNT)
+        )
+        groups = [cls.group, *Group.objects.filter(slug__startswith='group')]
+        User.objects.bulk_create(
+            User(username=f'author{i}') for i in range(AUTHORS_COUNT))
+        authors = list(User.objects.filter(username__startswith='author'))
+        Post.objects.bulk_create(
+            Post(
+                author=authors[i % AUTHORS_COUNT],
+                group=groups[i % len(groups)] if i % 3 else None,
+                text=EXAMPLE_TEXT,
+            )
+            for i in range(POSTS_COUNT)
+        )
+        cls.post = Post.objects.filter(author=authors[0]).first()
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=EXAMPLE_TEXT)
+            for _ in range(COMMENTS_COUNT)
+        )
+        Follow.objects.bulk_create(
+            Follow(
+                user=author,
+                author=authors[(i + shift) % AUTHORS_COUNT],
+            )
+            for i, author in enumerate(authors)
+            for shift in range(1, FOLLOWS_PER_AUTHOR + 1)
+        )
+        for author in authors[:5]:
+            Follow.objects.create(user=cls.user, author=author)
+        reconcile_user_stats()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.author = authors[0]
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def capture_plans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        plans = {}
+        for query in context.captured_queries:
+            sql = query['sql']
+            if sql.startswith('SELECT'):
+                plans[sql] = explain(sql, ())
+        return plans
+
+    def test_views_use_indexes(self):
+        urls = (
+            reverse(INDEX_URL),
+            reverse(GROUP_LIST_URL, kwargs={'slug': EXAMPLE_SLUG}),
+            reverse(PROFILE_URL, kwargs={'username': self.author.username}),
+            reverse(POST_DETAIL_URL, kwargs={'post_id': self.post.id}),
+            reverse(FOLLOW_INDEX_URL),
+        )
+        for url in urls:
+            for sql, plan in self.capture_plans(url).items():
+                with self.subTest(url=url, sql=sql):
+                    for step in plan:
+                        self.assertIsNone(FULL_SCAN.match(step), plan)
+                        self.assertNotIn(TEMP_SORT, step, plan)
+
+    def test_comments_use_index(self):
+        queryset = self.post.comments.order_by('pub_date', 'id')[:10]
+        sql, params = queryset.query.sql_with_params()
+        for step in explain(sql, params):
+            self.assertIsNone(FULL_SCAN.match(step))
+            self.assertNotIn(TEMP_SORT, step)
@@ -0,0 +1,69 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from posts import outbox
+from posts.models import Post, User
+from posts.tests.constants import EXAMPLE_USERNAME, SEARCH_URL
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=EXAMPLE_USERNAME)
+        cls.post = Post.objects.create(
+            author=cls.user, text='Морской <b>закат</b> над гаванью')
+        cls.other_post = Post.objects.create(
+            author=cls.user, text='Горный рассвет')
+        outbox.process_all()
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query):
+        response = self.client.get(reverse(SEARCH_URL), {'q': query})
+        return list(response.context['page_obj']), response
+
+    def test_search_finds_post(self):
+        """Поиск находит пост по префиксу слова и подсвечивает его."""
+        posts, response = self.search('гаван')
+        self.assertEqual(posts, [self.post])
+        self.assertContains(response, '<mark>гаванью</mark>')
+        self.assertContains(response, '&lt;b&gt;')
+
+    def test_search_without_fts_escapes_once(self):
+        """Без FTS5 текст поста экранируется один раз."""
+        with mock.patch('posts.search.fts_enabled', return_value=False):
+            posts, response = self.search('закат')
+        self.assertEqual(posts, [self.post])
+        self.assertContains(response, '&lt;b&gt;закат')
+        self.assertNotContains(response, '&amp;lt;')
+
+    def test_search_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        self.other_post.text = 'Горный закат'
+        self.other_post.save()
+        outbox.process_all()
+        posts, _ = self.search('закат')
+        self.assertEqual(len(posts), 2)
+        self.other_post.delete()
+        outbox.process_all()
+        posts, _ = self.search('закат')
+        self.assertEqual(posts, [self.post])
+
+    def test_search_ignores_fts_syntax(self):
+        """Служебные символы FTS в запросе не ломают поиск."""
+        posts, _ = self.search('"закат*) (')
+        self.assertEqual(posts, [self.post])
+
+    def test_rebuild_search_index(self):
+        Post.objects.filter(pk=self.other_post.pk).update(text='Туман')
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Поисковый индекс перестроен', out.getvalue())
+        posts, _ = self.search('туман')
+        self.assertEqual(posts, [self.other_post])
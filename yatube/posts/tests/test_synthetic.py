@@ -0,0 +1,48 @@
+from django.test import TestCase
+
+from posts.counters import reconcile_comments_count, reconcile_user_stats
+from posts.models import Comment, FeedEntry, Follow, Post
+from posts.synthetic import SyntheticData
+
+
+def generate(seed=0):
+    data = SyntheticData(
+        users=30,
+        groups=3,
+        posts=200,
+        follows_per_user=5,
+        seed=seed,
+        batch_size=50,
+    )
+    data.generate()
+    return data
+
+
+class SyntheticDataTests(TestCase):
+    def test_generated_data_is_consistent(self):
+        """Счётчики и ленты совпадают с тем, что построили бы сигналы."""
+        data = generate()
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), data.comments_created)
+        self.assertEqual(reconcile_user_stats(), 0)
+        self.assertEqual(reconcile_comments_count(), 0)
+        expected_feed = sum(
+            Follow.objects.filter(author_id=author_id).count()
+            for author_id in Post.objects.values_list('author_id', flat=True)
+        )
+        self.assertEqual(FeedEntry.objects.count(), expected_feed)
+        self.assertEqual(
+            [name for name, _, _ in data.stats],
+            ['users', 'groups', 'follows', 'posts, comments, feed',
+             'user stats', 'search index'],
+        )
+
+    def test_same_seed_same_data(self):
+        generate(seed=1)
+        first = list(
+            Post.objects.order_by('id').values_list('text', flat=True))
+        Post.objects.all().delete()
+        generate(seed=1)
+        second = list(
+            Post.objects.order_by('id').values_list('text', flat=True))
+        self.assertEqual(first, second)
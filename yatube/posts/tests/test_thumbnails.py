@@ -0,0 +1,99 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+
+from posts import outbox
+from posts.models import Post, User
+from posts.tests.constants import (
+    EXAMPLE_TEXT,
+    EXAMPLE_USERNAME,
+    POST_DETAIL_URL,
+)
+from posts.thumbnails import process_pending, ready_thumbnail
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+PLACEHOLDER = 'Изображение обрабатывается'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=EXAMPLE_USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user,
+            text=EXAMPLE_TEXT,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        self.url = reverse(POST_DETAIL_URL, kwargs={'post_id': self.post.id})
+
+    @override_settings(OUTBOX_PROCESS_AFTER_RESPONSE=False)
+    def test_placeholder_until_ready(self):
+        """Пока миниатюры строятся, вместо картинки выводится заглушка."""
+        response = self.client.get(self.url)
+        self.assertContains(response, PLACEHOLDER)
+        self.assertEqual(process_pending(workers=0), (1, self.post.id))
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.thumbnails_ready)
+        response = self.client.get(self.url)
+        self.assertNotContains(response, PLACEHOLDER)
+        self.assertContains(response, '<img class="card-img')
+
+    def test_new_image_resets_thumbnails(self):
+        """Замена картинки снова ставит пост в очередь."""
+        process_pending(workers=0)
+        self.post.refresh_from_db()
+        self.post.image = SimpleUploadedFile(
+            'other.gif', SMALL_GIF, 'image/gif')
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertFalse(self.post.thumbnails_ready)
+
+    def test_ready_thumbnail_only_looks_up(self):
+        """Отрисовка берёт готовую миниатюру и не строит пропавшую."""
+        process_pending(workers=0)
+        self.post.refresh_from_db()
+        for preset, (geometry, options) in (
+                settings.POST_THUMBNAIL_PRESETS.items()):
+            with self.subTest(preset=preset):
+                self.assertEqual(
+                    ready_thumbnail(self.post, preset).name,
+                    get_thumbnail(self.post.image, geometry, **options).name,
+                )
+        preset = next(iter(settings.POST_THUMBNAIL_PRESETS))
+        self.post.thumbnails = '{}'
+        with mock.patch('posts.thumbnails.get_thumbnail') as build:
+            self.assertIsNone(ready_thumbnail(self.post, preset))
+        build.assert_not_called()
+
+    def test_saved_image_queues_generation(self):
+        """Сохранение картинки ставит миниатюры в очередь событий."""
+        outbox.process_all()
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.thumbnails_ready)
+        self.assertEqual(process_pending(workers=0), (0, None))
@@ -5,11 +5,14 @@ from django import forms
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.forms import PostForm
-from posts.models import Group, Post, User
+from posts.models import Comment, Group, Post, User
+from posts.utils import NEXT
 from posts.tests.constants import (
     EXAMPLE_SLUG,
     EXAMPLE_USERNAME,
@@ -22,6 +25,7 @@ from posts.tests.constants import (
     POST_DETAIL_URL,
     POST_EDIT_URL,
     POST_CREATE_URL,
+    POST_COMMENTS_URL,
     INDEX_TEMPLATE,
     GROUP_LIST_TEMPLATE,
     PROFILE_TEMPLATE,
@@ -224,3 +228,99 @@ class TestPaginator(TestCase):
                         f'{url}?page={page}')
                     self.assertEqual(len(
                         response.context.get('page_obj')), post_count)
+
+    def test_cursor_paginator(self):
+        """Курсорная пагинация проходит ленту вперёд и назад."""
+        url = reverse(INDEX_URL)
+        cache.clear()
+        response = self.authorized_client.get(url)
+        first_page = response.context.get('page_obj')
+        self.assertEqual(len(first_page), 10)
+        self.assertFalse(first_page.has_previous())
+        response = self.authorized_client.get(
+            url, {'cursor': first_page.next_cursor})
+        second_page = response.context.get('page_obj')
+        self.assertEqual(len(second_page), 4)
+        self.assertFalse(second_page.has_next())
+        response = self.authorized_client.get(
+            url, {'cursor': second_page.previous_cursor})
+        self.assertEqual(
+            list(response.context.get('page_obj')), list(first_page))
+
+    def test_cursor_paginator_empty_next_page(self):
+        """С пустой следующей страницы можно вернуться назад."""
+        url = reverse(INDEX_URL)
+        cache.clear()
+        first_page = self.authorized_client.get(url).context.get('page_obj')
+        last_page = self.authorized_client.get(
+            url, {'cursor': first_page.next_cursor}).context.get('page_obj')
+        cursor = last_page.paginator.encode_cursor(NEXT, last_page[-1])
+        response = self.authorized_client.get(url, {'cursor': cursor})
+        empty_page = response.context.get('page_obj')
+        self.assertEqual(len(empty_page), 0)
+        self.assertTrue(empty_page.has_previous())
+        self.assertContains(response, 'Предыдущая')
+        response = self.authorized_client.get(
+            url, {'cursor': empty_page.previous_cursor})
+        self.assertTrue(len(response.context.get('page_obj')))
+
+    def test_invalid_cursor(self):
+        """Некорректный курсор открывает первую страницу."""
+        cache.clear()
+        response = self.authorized_client.get(
+            reverse(INDEX_URL), {'cursor': 'broken'})
+        self.assertEqual(len(response.context.get('page_obj')), 10)
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class TestCommentsPagination(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=EXAMPLE_USERNAME)
+        cls.post = Post.objects.create(author=cls.user, text=EXAMPLE_TEXT)
+        cls.other_post = Post.objects.create(
+            author=cls.user, text=EXAMPLE_TEXT)
+        User.objects.bulk_create(
+            User(username=f'commenter{i}') for i in range(12))
+        authors = User.objects.filter(
+            username__startswith='commenter').order_by('id')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=author, text=f'comment{i}')
+            for i, author in enumerate(authors)
+        )
+        Comment.objects.bulk_create(
+            Comment(post=cls.other_post, author=author, text=EXAMPLE_TEXT)
+            for author in authors[:3]
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_load_more(self):
+        """Комментарии подгружаются страницами от старых к новым."""
+        response = self.client.get(
+            reverse(POST_DETAIL_URL, args=[self.post.id]))
+        page = response.context['comments']
+        texts = [comment.text for comment in page]
+        while page.has_next():
+            response = self.client.get(
+                reverse(POST_COMMENTS_URL, args=[self.post.id]),
+                {'cursor': page.next_cursor},
+            )
+            page = response.context['comments']
+            texts += [comment.text for comment in page]
+        self.assertEqual(texts, [f'comment{i}' for i in range(12)])
+
+    def test_queries_do_not_depend_on_comments_count(self):
+        queries = []
+        for post in (self.post, self.other_post):
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(reverse(POST_COMMENTS_URL, args=[post.id]))
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_unknown_post(self):
+        response = self.client.get(reverse(POST_COMMENTS_URL, args=[0]))
+        self.assertEqual(response.status_code, 404)
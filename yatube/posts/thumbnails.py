@@ -0,0 +1,106 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Запрос никогда не строит миниатюры сам: пока у поста не выставлен
+thumbnails_ready, шаблоны выводят заглушку. Сохранение поста с новой
+картинкой добавляет событие thumbnails.requested, и миниатюры всех
+пресетов из POST_THUMBNAIL_PRESETS строит потребитель событий (см.
+posts.consumers). Команда generate_thumbnails строит их в пуле потоков
+для постов, оставшихся без миниатюр. Имена файлов миниатюр
+сохраняются в посте, флаг выставляется, а страницы с постом
+сбрасываются из кэша.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core.metrics import THUMBNAILS
+
+from .caching import invalidate_tags_on_commit, post_page_tags
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def ready_thumbnail(post, preset):
+    """Готовая миниатюра картинки поста или None, пока её нет.
+
+    Файл берётся по имени, сохранённому в посте: ни картинка, ни sorl
+    при отрисовке не трогаются.
+    """
+    if not post.image or not post.thumbnails_ready:
+        return None
+    name = json.loads(post.thumbnails or '{}').get(preset)
+    if name is None:
+        return None
+    return ImageFile(name, default.storage)
+
+
+def pending_posts():
+    return Post.objects.filter(thumbnails_ready=False).exclude(image='')
+
+
+@THUMBNAILS.time()
+def generate(post_id):
+    """Строит миниатюры поста; возвращает True, если они готовы."""
+    try:
+        post = Post.objects.select_related('author', 'group').get(pk=post_id)
+        image = post.image.name
+        if not image:
+            return False
+        names = {}
+        presets = settings.POST_THUMBNAIL_PRESETS.items()
+        for preset, (geometry, options) in presets:
+            thumbnail = get_thumbnail(post.image, geometry, **options)
+            if not thumbnail.exists():
+                logger.warning('Нет миниатюры %s для поста %s',
+                               geometry, post_id)
+                return False
+            names[preset] = thumbnail.name
+        # Картинку могли заменить, пока строились миниатюры.
+        if not Post.objects.filter(pk=post_id, image=image).update(
+                thumbnails_ready=True, thumbnails=json.dumps(names)):
+            return False
+        invalidate_tags_on_commit(*post_page_tags(post))
+        return True
+    except Post.DoesNotExist:
+        return False
+    except Exception:
+        logger.exception('Не удалось построить миниатюры поста %s', post_id)
+        return False
+
+
+def _generate_in_worker(post_id):
+    try:
+        return generate(post_id)
+    finally:
+        # Соединения с базой у каждого потока свои.
+        connections.close_all()
+
+
+def process_pending(workers=None, batch_size=100, after_id=0):
+    """Строит миниатюры для очередной пачки постов из очереди.
+
+    Возвращает число постов с готовыми миниатюрами и id последнего
+    просмотренного поста, чтобы посты с битыми картинками не
+    загораживали очередь. При workers=0 миниатюры строятся в текущем
+    потоке.
+    """
+    post_ids = list(
+        pending_posts().filter(id__gt=after_id).order_by('id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not post_ids:
+        return 0, None
+    if workers is None:
+        workers = settings.THUMBNAIL_WORKERS
+    if not workers:
+        return sum(map(generate, post_ids)), post_ids[-1]
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix='thumbnails'
+    ) as executor:
+        return sum(executor.map(_generate_in_worker, post_ids)), post_ids[-1]
@@ -2,7 +2,7 @@ from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -15,7 +15,10 @@ urlpatterns = [
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -26,6 +29,17 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('api/v1/posts/', api.posts, name='api_posts'),
+    path('api/v1/posts/<int:post_id>/', api.post, name='api_post'),
+    path('api/v1/posts/<int:post_id>/comments/',
+         api.post_comments, name='api_post_comments'),
+    path('api/v1/groups/<slug:slug>/', api.group, name='api_group'),
+    path('api/v1/groups/<slug:slug>/posts/',
+         api.group_posts, name='api_group_posts'),
+    path('api/v1/profiles/<str:username>/',
+         api.profile, name='api_profile'),
+    path('api/v1/profiles/<str:username>/posts/',
+         api.profile_posts, name='api_profile_posts'),
 ]
 
 if settings.DEBUG:
@@ -1,7 +1,166 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
 
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
 
-def paginate(objects, page_number, posts_per_page=10):
+NEXT = 'next'
+PREVIOUS = 'previous'
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    По умолчанию первая страница содержит самые новые записи, при
+    descending=False — самые старые. Страницы адресуются непрозрачными
+    токенами, в которых закодированы направление и ключ крайней записи.
+    Общего числа записей и номеров страниц у пагинатора нет: `number`
+    и `num_pages` относительные и нужны только методам
+    `Page.has_next()` и `Page.has_previous()`, а `count`, а с ним и
+    `Page.start_index()` с `Page.end_index()`, недоступны.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 descending=True):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.descending = descending
+        self.has_next_page = False
+        self.has_previous_page = False
+
+    def _check_object_list_is_ordered(self):
+        """Порядок задаёт сам пагинатор, сортировка queryset не важна."""
+
+    @property
+    def count(self):
+        raise NotImplementedError('CursorPaginator не считает записи')
+
+    @property
+    def num_pages(self):
+        return self.number + int(self.has_next_page)
+
+    @property
+    def number(self):
+        return 1 + int(self.has_previous_page)
+
+    def encode_cursor(self, direction, obj):
+        return self.encode_values(
+            direction, [getattr(obj, key) for key in self.keys])
+
+    def encode_values(self, direction, values):
+        # isoformat() сохраняет микросекунды, которые DjangoJSONEncoder
+        # обрезает: без них граница страницы съедала бы соседние записи.
+        raw = json.dumps(
+            [direction, *values], default=lambda value: value.isoformat())
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, значения ключа) или None."""
+        if not cursor:
+            return None
+        try:
+            direction, *raw_values = json.loads(
+                base64.urlsafe_b64decode(cursor.encode()))
+            if direction not in (NEXT, PREVIOUS):
+                return None
+            if len(raw_values) != len(self.keys):
+                return None
+            meta = self.object_list.model._meta
+            values = [
+                meta.get_field(key).to_python(value)
+                for key, value in zip(self.keys, raw_values)
+            ]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            return None
+        return direction, values
+
+    def _keyset_filter(self, values, lookup):
+        first_key, second_key = self.keys
+        first_value, second_value = values
+        return (
+            Q(**{f'{first_key}__{lookup}': first_value})
+            | Q(**{first_key: first_value,
+                   f'{second_key}__{lookup}': second_value})
+        )
+
+    def _fetch(self, queryset, ordering):
+        """Выбирает per_page + 1 записей в порядке ordering.
+
+        Сначала по индексу выбираются только первичные ключи, затем
+        записи подгружаются вместе с select_related. Без соединений
+        в первом запросе планировщик SQLite не меняет порядок обхода
+        таблиц и не сортирует всю выборку ради LIMIT.
+        """
+        pks = list(
+            queryset.order_by(*ordering)
+            .values_list('pk', flat=True)[:self.per_page + 1]
+        )
+        objects = queryset.in_bulk(pks)
+        return [objects[pk] for pk in pks]
+
+    def page(self, cursor=None):
+        decoded = self.decode_cursor(cursor)
+        ascending = list(self.keys)
+        descending = [f'-{key}' for key in self.keys]
+        if self.descending:
+            forward, backward, after, before = (
+                descending, ascending, 'lt', 'gt')
+        else:
+            forward, backward, after, before = (
+                ascending, descending, 'gt', 'lt')
+        queryset = self.object_list
+        next_cursor = previous_cursor = None
+        if decoded is None:
+            objects = self._fetch(queryset, forward)
+            if len(objects) > self.per_page:
+                next_cursor = self.encode_cursor(
+                    NEXT, objects[self.per_page - 1])
+            objects = objects[:self.per_page]
+        elif decoded[0] == NEXT:
+            objects = self._fetch(
+                queryset.filter(self._keyset_filter(decoded[1], after)),
+                forward,
+            )
+            if len(objects) > self.per_page:
+                next_cursor = self.encode_cursor(
+                    NEXT, objects[self.per_page - 1])
+            objects = objects[:self.per_page]
+            # На страницу пришли со страницы перед ней, даже если эта
+            # страница оказалась пустой.
+            previous_cursor = (
+                self.encode_cursor(PREVIOUS, objects[0]) if objects
+                else self.encode_values(PREVIOUS, decoded[1])
+            )
+        else:
+            objects = self._fetch(
+                queryset.filter(self._keyset_filter(decoded[1], before)),
+                backward,
+            )
+            if len(objects) > self.per_page:
+                previous_cursor = self.encode_cursor(
+                    PREVIOUS, objects[self.per_page - 1])
+            objects = objects[:self.per_page][::-1]
+            next_cursor = (
+                self.encode_cursor(NEXT, objects[-1]) if objects
+                else self.encode_values(NEXT, decoded[1])
+            )
+        self.has_next_page = next_cursor is not None
+        self.has_previous_page = previous_cursor is not None
+        page = Page(objects, self.number, self)
+        page.next_cursor = next_cursor
+        page.previous_cursor = previous_cursor
+        return page
+
+
+def paginate(objects, page_number, posts_per_page=10, cursor=None,
+             keys=('pub_date', 'id'), descending=True):
+    """Номер страницы включает классический режим, иначе — курсорный."""
+    if page_number is None:
+        return CursorPaginator(
+            objects, posts_per_page, keys, descending).page(cursor)
     paginator = Paginator(objects, posts_per_page)
     page_obj = paginator.get_page(page_number)
     return page_obj
@@ -1,26 +1,53 @@
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
-
-from .models import Post, Group, User, Follow
+from django.conf import settings
+from django.db import transaction
+from django.utils.http import urlencode
+
+from core.routers import writes_database
+
+from .caching import (
+    author_tags,
+    cache_page_tagged,
+    conditional_tagged,
+    follow_tags,
+    group_tags,
+    index_tags,
+    post_detail_tags,
+    post_tags,
+)
+from .models import Comment, Post, Group, User, Follow, UserStats
+from .feeds import follow_feed_page
 from .forms import PostForm, CommentForm
+from .search import SearchResults
 from .utils import paginate
 
 
-@cache_page(20, key_prefix='index_page')
+@cache_page_tagged(
+    settings.PAGE_CACHE_TIMEOUT, 'index_page', index_tags, follow_holes=True)
 def index(request):
     posts = Post.objects.select_related('author', 'group').all()
-    page_obj = paginate(posts, request.GET.get('page'))
+    page_obj = paginate(
+        posts, request.GET.get('page'), cursor=request.GET.get('cursor'))
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_page_tagged(
+    settings.PAGE_CACHE_TIMEOUT, 'group_page', group_tags, follow_holes=True)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author').all()
-    page_obj = paginate(posts, request.GET.get('page'))
+    posts = Post.objects.filter(group__slug=slug).select_related(
+        'author', 'group')
+    page_obj = paginate(
+        posts, request.GET.get('page'), cursor=request.GET.get('cursor'))
+    # Группа приходит вместе с постами страницы; отдельный запрос
+    # нужен только для пустой страницы.
+    if len(page_obj):
+        group = page_obj[0].group
+    else:
+        group = get_object_or_404(Group, slug=slug)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -28,34 +55,76 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_page_tagged(
+    settings.PAGE_CACHE_TIMEOUT, 'profile_page', author_tags,
+    follow_holes=True,
+)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     posts = author.posts.all().select_related('group',)
-    page_obj = paginate(posts, request.GET.get('page'))
+    page_obj = paginate(
+        posts, request.GET.get('page'), cursor=request.GET.get('cursor'))
 
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': request.user == author or (
-            request.user.is_authenticated and (
-                Follow.objects.filter(user=request.user, author=author)
-                .exists())
-        )
+        'posts_count': getattr(author, 'stats', UserStats()).posts_count,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = paginate(SearchResults(query), request.GET.get('page') or 1)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@cache_page_tagged(settings.PAGE_CACHE_TIMEOUT, 'post_page', post_detail_tags)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    form = CommentForm(request.POST or None)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
     context = {
         'post': post,
-        'form': form,
+        'post_id': post.id,
+        'form': CommentForm(),
+        'comments': comments_page(
+            post.id, request.GET.get('comments_cursor')),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_page(post_id, cursor):
+    """Страница комментариев поста, от старых к новым."""
+    comments = Comment.objects.filter(
+        post_id=post_id).select_related('author')
+    return paginate(
+        comments,
+        None,
+        settings.COMMENTS_PER_PAGE,
+        cursor=cursor,
+        descending=False,
+    )
+
+
+@cache_page_tagged(settings.PAGE_CACHE_TIMEOUT, 'comments_page', post_tags)
+def post_comments(request, post_id):
+    """Фрагмент со следующей страницей комментариев для «Показать ещё»."""
+    get_object_or_404(Post.objects.only('id'), pk=post_id)
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(post_id, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -73,6 +142,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = PostForm(
@@ -93,8 +163,10 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -105,14 +177,18 @@ def add_comment(request, post_id):
 
 
 @login_required
+@conditional_tagged(follow_tags)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginate(post_list, request.GET.get('page'))
+    page_obj = follow_feed_page(
+        request.user, request.GET.get('page'),
+        cursor=request.GET.get('cursor'))
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@writes_database
+@transaction.atomic
 def profile_follow(request, username):
     if request.user.username != username:
         user_follow = get_object_or_404(User, username=username)
@@ -121,6 +197,8 @@ def profile_follow(request, username):
 
 
 @login_required
+@writes_database
+@transaction.atomic
 def profile_unfollow(request, username):
     Follow.objects.filter(
         user=request.user, author__username=username).delete()
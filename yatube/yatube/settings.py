@@ -50,7 +50,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.SQLInstrumentationMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -75,6 +79,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.cache_timeouts.cache_timeouts',
             ],
         },
     },
@@ -88,17 +93,75 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами: прагмы задаются один раз.
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_DB_CONN_MAX_AGE', 600)),
     }
 }
 
+# Прагмы каждого соединения SQLite, см. core.sqlite.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 2 ** 20,
+    # Отрицательный размер — в килобайтах: 64 МБ.
+    'cache_size': -64 * 2 ** 10,
+    'busy_timeout': 5000,
+}
+
+# Сколько строк индекса читает ANALYZE и сколько свободных страниц
+# возвращает за проход команда sqlite_maintenance.
+SQLITE_ANALYSIS_LIMIT = 1000
+
+SQLITE_VACUUM_PAGES = 10_000
+
+# Реплики для чтения: пути к копиям базы через запятую. Копии
+# обновляет команда sync_replicas, см. core.routers.
+DATABASE_REPLICAS = []
+for index, path in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Насколько реплики могут отставать от основной базы, в секундах.
+# Столько же после записи пользователь читает из основной базы, а
+# страницы с недавно изменёнными тегами отрисовываются по ней.
+REPLICA_MAX_LAG = 5
+
+PRIMARY_COOKIE_NAME = 'read_primary'
+
+# Общий для всех процессов хоста кэш в файле SQLite, см. core.cache.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+            'MAX_SIZE': 256 * 2 ** 20,
+        },
     }
 }
 
+# Тесты очищают кэш, поэтому их кэш лежит в отдельном файле, см.
+# core.testing.TestRunner.
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Страницы сбрасываются по тегам при изменении данных,
+# поэтому их можно хранить долго.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Ключ карточки поста меняется вместе с её содержимым, а старые
+# карточки вытесняются по этому сроку.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -154,3 +217,111 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Авторы, у которых подписчиков больше этого числа, не рассылают посты
+# во входящие ленты: их посты подмешиваются в ленту при чтении.
+FEED_FANOUT_LIMIT = 1000
+
+FEED_BATCH_SIZE = 500
+
+# Сколько событий потребитель берёт за транзакцию и обрабатываются ли
+# события запроса сразу после ответа, см. posts.outbox. Без этого их
+# обрабатывает только команда process_outbox.
+OUTBOX_BATCH_SIZE = 100
+
+OUTBOX_PROCESS_AFTER_RESPONSE = True
+
+# Столько раз потребитель пробует событие, на котором падает
+# обработчик, прежде чем пропустить его (см. OutboxFailure).
+OUTBOX_MAX_ATTEMPTS = 5
+
+# Срок жизни подписок пользователя в кэше, см. posts.follow_graph.
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+
+COMMENTS_PER_PAGE = 50
+
+# Размер страницы JSON API по умолчанию и наибольший, см. posts.api.
+API_PAGE_SIZE = 20
+
+API_MAX_PAGE_SIZE = 100
+
+# Сколько SQL-запросов может сделать view, включая сессию и
+# пользователя, при пустом кэше; превышение пишется в лог, а в тестах —
+# падает.
+SQL_QUERY_BUDGETS = {
+    'posts:index': 5,
+    'posts:group_list': 5,
+    'posts:profile': 6,
+    'posts:post_detail': 6,
+    'posts:post_comments': 3,
+    'posts:post_create': 10,
+    'posts:post_edit': 11,
+    'posts:add_comment': 8,
+    'posts:follow_index': 6,
+    'posts:search': 5,
+    'posts:profile_follow': 13,
+    'posts:profile_unfollow': 11,
+    'posts:api_posts': 2,
+    'posts:api_post': 1,
+    'posts:api_post_comments': 3,
+    'posts:api_group': 1,
+    'posts:api_group_posts': 3,
+    'posts:api_profile': 1,
+    'posts:api_profile_posts': 3,
+}
+
+# Столько одинаковых по форме запросов за один запрос к сайту —
+# признак N+1.
+SQL_REPEATED_QUERY_LIMIT = 3
+
+# Миниатюры картинок постов строит в фоне команда generate_thumbnails.
+POST_THUMBNAIL_PRESETS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+THUMBNAIL_WORKERS = 2
+
+# Загрузки не держатся в памяти: каждая пишется во временный файл.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+
+# Картинки больше IMAGE_MAX_PIXELS отклоняются по заголовку, а за один
+# запрос декодируется не больше IMAGE_DECODE_PIXELS_LIMIT пикселей.
+IMAGE_MAX_PIXELS = 64_000_000
+
+IMAGE_DECODE_PIXELS_LIMIT = 16_000_000
+
+# Картинки с длинной стороной больше этой уменьшаются при загрузке.
+IMAGE_INGEST_MAX_SIZE = 2560
+
+# Метрики для Prometheus на странице /metrics. Каждый процесс пишет
+# свой файл в METRICS_DIR; каталог очищают перед запуском сервера.
+METRICS_ENABLED = True
+
+METRICS_DIR = os.environ.get(
+    'YATUBE_METRICS_DIR', os.path.join(BASE_DIR, 'metrics'))
+
+# /metrics открыта сотрудникам и запросам с заголовком
+# Authorization: Bearer METRICS_TOKEN; пустой токен запросы не пускает.
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+
+# Выборочное профилирование запросов; по умолчанию выключено.
+# Профили смотрят сотрудники на странице /admin/profiles/.
+PROFILING_SAMPLE_RATE = 0.0
+
+PROFILING_VIEWS = []
+
+# Запрос с заголовком PROFILING_HEADER: PROFILING_TOKEN профилируется
+# всегда. Пустой токен отключает этот способ.
+PROFILING_HEADER = 'X-Profile'
+
+PROFILING_TOKEN = os.environ.get('YATUBE_PROFILING_TOKEN', '')
+
+PROFILING_INTERVAL = 0.005
+
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
+PROFILING_KEEP = 100